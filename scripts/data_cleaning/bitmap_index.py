@@ -0,0 +1,250 @@
+"""
+Bitmap indexes over the simplified Economic Census outputs for fast predicate filtering
+- Small-domain score columns get one bitmap per value
+- Ratio columns get one bitmap per bucket (values are kept to refine boundary buckets)
+- Employment and firm count columns get a non-zero bitmap
+
+Example:
+    index = BitmapIndex.load(CLEANED_FILES_DIR / "ec13_bitmap_index.npz")
+    units = index.filter([
+        ('ec13_service_sophistication_score', '>=', 4),
+        ('ec13_retail_diversity', '==', 2),
+        ('ec13_emp_financial_services', '>', 0),
+    ])
+"""
+
+import operator
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+MAX_VALUE_DOMAIN = 32
+RATIO_BUCKETS = 10
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '>': operator.gt,
+    '<=': operator.le,
+    '<': operator.lt,
+}
+
+def get_index_type(df_simplified, column, prefix):
+    """Decide which kind of bitmap index suits a column (or None to skip it)"""
+
+    values = df_simplified[column]
+    if column == 'shrid2' or not pd.api.types.is_numeric_dtype(values):
+        return None
+
+    if column.endswith('_score') or column.endswith('_diversity'):
+        is_integer = np.array_equal(values, np.round(values))
+        if is_integer and values.min() >= 0 and values.max() <= MAX_VALUE_DOMAIN:
+            return 'value'
+
+    if column.startswith(f'{prefix}_emp_') or column.startswith(f'{prefix}_count_') \
+            or column == f'{prefix}_non_farm_employment':
+        return 'nonzero'
+
+    return 'bucket'
+
+def get_bucket_edges(values, column):
+    """Bucket edges for a ratio column; outer edges are open so every value falls in a bucket"""
+
+    if column.endswith('_ratio') or column.endswith('_hhi'):
+        inner_edges = np.linspace(0, 1, RATIO_BUCKETS + 1)[1:-1]
+    else:
+        # Unbounded ratios (firm density, employment per firm) use decile edges
+        inner_edges = np.unique(np.nanquantile(values, np.linspace(0, 1, RATIO_BUCKETS + 1)[1:-1]))
+
+    return np.concatenate([[-np.inf], inner_edges, [np.inf]])
+
+def pack(mask):
+    """Compress a boolean mask into a bitmap (8 units per byte)"""
+    return np.packbits(mask)
+
+def invert(bitmap, n_units):
+    """Bitwise NOT that keeps the padding bits after the last unit cleared"""
+    return pack(~np.unpackbits(bitmap, count=n_units).astype(bool))
+
+def bucket_coverage(op, value, left, right):
+    """Whether a bucket [left, right) fully, partially or never satisfies 'x op value'"""
+
+    if op == '>=':
+        full, empty = left >= value, right <= value
+    elif op == '>':
+        full, empty = left > value, right <= value
+    elif op == '<=':
+        full, empty = right <= value, left > value
+    elif op == '<':
+        full, empty = right <= value, left >= value
+    else:
+        full, empty = False, not (left <= value < right)
+
+    return 'full' if full else ('empty' if empty else 'partial')
+
+def build_bitmap_index(df_simplified, prefix):
+    """Build bitmap indexes for every indexable column of one census year"""
+
+    print(f"Building bitmap indexes for {prefix.upper()}...")
+
+    bitmaps = {}
+    bucket_edges = {}
+    bucket_values = {}
+    index_types = {}
+
+    for column in df_simplified.columns:
+        index_type = get_index_type(df_simplified, column, prefix)
+        if index_type is None:
+            continue
+
+        values = df_simplified[column].to_numpy(dtype=float)
+        index_types[column] = index_type
+
+        if index_type == 'value':
+            for value in np.unique(values):
+                bitmaps[(column, int(value))] = pack(values == value)
+
+        elif index_type == 'nonzero':
+            bitmaps[(column, 'nonzero')] = pack(values != 0)
+
+        else:
+            edges = get_bucket_edges(values, column)
+            buckets = np.searchsorted(edges[1:-1], values, side='right')
+            for bucket in range(len(edges) - 1):
+                bitmaps[(column, bucket)] = pack(buckets == bucket)
+            bucket_edges[column] = edges
+            bucket_values[column] = values
+
+    print(f"Built {len(bitmaps)} bitmaps over {len(index_types)} columns")
+
+    return BitmapIndex(df_simplified['shrid2'].to_numpy(dtype=str).astype(bytes),
+                       index_types, bitmaps, bucket_edges, bucket_values)
+
+class BitmapIndex:
+    """Compressed bitmaps per value / bucket / non-zero flag, answering conjunctive predicates"""
+
+    def __init__(self, shrid2, index_types, bitmaps, bucket_edges, bucket_values):
+        self.shrid2 = shrid2
+        self.n_units = len(shrid2)
+        self.index_types = index_types
+        self.bitmaps = bitmaps
+        self.bucket_edges = bucket_edges
+        self.bucket_values = bucket_values
+
+    def save(self, path):
+        """Save all bitmaps in one compressed .npz file"""
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        arrays = {'shrid2': self.shrid2}
+        for column, index_type in self.index_types.items():
+            arrays[f'type|{column}'] = np.array(index_type)
+        for (column, key), bitmap in self.bitmaps.items():
+            arrays[f'bitmap|{column}|{key}'] = bitmap
+        for column, edges in self.bucket_edges.items():
+            arrays[f'edges|{column}'] = edges
+            arrays[f'values|{column}'] = self.bucket_values[column]
+
+        np.savez_compressed(path, **arrays)
+        print(f"Saved bitmap index to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved with BitmapIndex.save"""
+
+        index_types, bitmaps, bucket_edges, bucket_values = {}, {}, {}, {}
+
+        with np.load(path) as index_file:
+            shrid2 = index_file['shrid2']
+            for name in index_file.files:
+                parts = name.split('|')
+                if parts[0] == 'type':
+                    index_types[parts[1]] = str(index_file[name])
+                elif parts[0] == 'bitmap':
+                    key = parts[2] if parts[2] == 'nonzero' else int(parts[2])
+                    bitmaps[(parts[1], key)] = index_file[name]
+                elif parts[0] == 'edges':
+                    bucket_edges[parts[1]] = index_file[name]
+                elif parts[0] == 'values':
+                    bucket_values[parts[1]] = index_file[name]
+
+        return cls(shrid2, index_types, bitmaps, bucket_edges, bucket_values)
+
+    def empty_bitmap(self):
+        return np.zeros((self.n_units + 7) // 8, dtype=np.uint8)
+
+    def evaluate(self, column, op, value):
+        """Bitmap of the units satisfying one predicate 'column op value'"""
+
+        if column not in self.index_types:
+            raise KeyError(f"Column '{column}' has no bitmap index")
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator '{op}', expected one of {list(OPERATORS)}")
+
+        index_type = self.index_types[column]
+
+        if index_type == 'value':
+            result = self.empty_bitmap()
+            for (indexed_column, indexed_value), bitmap in self.bitmaps.items():
+                if indexed_column == column and OPERATORS[op](indexed_value, value):
+                    result |= bitmap
+            return result
+
+        if index_type == 'nonzero':
+            nonzero = self.bitmaps[(column, 'nonzero')]
+            if value == 0 and op in ('!=', '>'):
+                return nonzero.copy()
+            if value == 0 and op in ('==', '<='):
+                return invert(nonzero, self.n_units)
+            raise ValueError(f"'{column}' only has a non-zero index: use '> 0', '!= 0' or '== 0'")
+
+        return self.evaluate_buckets(column, op, value)
+
+    def evaluate_buckets(self, column, op, value):
+        """OR the fully matching buckets and refine the boundary buckets with the stored values"""
+
+        if op == '!=':
+            return invert(self.evaluate_buckets(column, '==', value), self.n_units)
+
+        edges = self.bucket_edges[column]
+        result = self.empty_bitmap()
+
+        for bucket in range(len(edges) - 1):
+            coverage = bucket_coverage(op, value, edges[bucket], edges[bucket + 1])
+            if coverage == 'empty':
+                continue
+
+            bitmap = self.bitmaps[(column, bucket)]
+            if coverage == 'partial':
+                positions = np.flatnonzero(np.unpackbits(bitmap, count=self.n_units))
+                matches = OPERATORS[op](self.bucket_values[column][positions], value)
+                mask = np.zeros(self.n_units, dtype=bool)
+                mask[positions[matches]] = True
+                bitmap = pack(mask)
+
+            result |= bitmap
+
+        return result
+
+    def evaluate_all(self, predicates):
+        """Bitmap of the units satisfying every (column, op, value) predicate"""
+
+        result = None
+        for column, op, value in predicates:
+            bitmap = self.evaluate(column, op, value)
+            result = bitmap if result is None else result & bitmap
+
+        return result if result is not None else invert(self.empty_bitmap(), self.n_units)
+
+    def filter(self, predicates):
+        """shrid2 values of the units satisfying every predicate"""
+        positions = np.flatnonzero(np.unpackbits(self.evaluate_all(predicates), count=self.n_units))
+        return self.shrid2[positions].astype(str)
+
+    def count(self, predicates):
+        """Number of units satisfying every predicate"""
+        return int(np.unpackbits(self.evaluate_all(predicates), count=self.n_units).sum())
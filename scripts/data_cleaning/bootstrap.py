@@ -0,0 +1,189 @@
+"""
+State-stratified bootstrap confidence intervals for the simplified Economic Census outputs
+Replicates are generated in blocks as resample-count matrices (replicates x units) per state, so
+all columns of a block are summed with one matrix product per state. Blocks run in parallel
+threads with independent random streams, and memory is bounded by the block size
+
+Usage:
+    python bootstrap.py ../../data/processed/cleaned_files/ec13_shrid_simplified.csv --replicates 1000
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+from shrid_utils import extract_state_id
+
+DEFAULT_REPLICATES = 1000
+DEFAULT_BLOCK_SIZE = 50
+DEFAULT_BOOTSTRAP_SEED = 42
+DEFAULT_CONFIDENCE = 0.95
+
+class StratifiedBootstrap:
+    """Resample units with replacement within each state
+
+    Example:
+        bootstrap = StratifiedBootstrap(extract_state_id(df['shrid2']), n_replicates=1000)
+        stratum_totals = bootstrap.replicate_stratum_totals(df[columns].to_numpy(dtype=float))
+    """
+
+    def __init__(self, strata, n_replicates=DEFAULT_REPLICATES, block_size=DEFAULT_BLOCK_SIZE,
+                 seed=DEFAULT_BOOTSTRAP_SEED, workers=None):
+        codes, self.labels = pd.factorize(pd.Series(strata), sort=True)
+        self.order = np.argsort(codes, kind='stable')
+        self.boundaries = np.searchsorted(codes[self.order], np.arange(len(self.labels) + 1))
+        self.n_replicates = n_replicates
+        self.block_size = block_size
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+
+    def stratum_totals(self, values):
+        """Totals per stratum of the original data (n_strata x n_columns)"""
+
+        values = np.asarray(values, dtype=float)
+        return np.stack([values[self.order[start:end]].sum(axis=0)
+                         for start, end in zip(self.boundaries[:-1], self.boundaries[1:])])
+
+    def _replicate_block(self, sorted_values, n_block, seed_sequence):
+        """Stratum totals for one block of replicates (n_block x n_strata x n_columns)"""
+
+        rng = np.random.default_rng(seed_sequence)
+        totals = np.zeros((n_block, len(self.labels), sorted_values.shape[1]))
+
+        for stratum, (start, end) in enumerate(zip(self.boundaries[:-1], self.boundaries[1:])):
+            n_units = end - start
+            # Resample counts per replicate: how often each unit of the state was drawn
+            draws = rng.integers(0, n_units, size=(n_block, n_units))
+            draws += (np.arange(n_block) * n_units)[:, None]
+            counts = np.bincount(draws.ravel(), minlength=n_block * n_units).reshape(n_block, n_units)
+            totals[:, stratum, :] = counts @ sorted_values[start:end]
+
+        return totals
+
+    def replicate_stratum_totals(self, values):
+        """Stratum totals for every replicate (n_replicates x n_strata x n_columns)"""
+
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1:
+            values = values[:, None]
+        sorted_values = values[self.order]
+
+        block_sizes = [min(self.block_size, self.n_replicates - start)
+                       for start in range(0, self.n_replicates, self.block_size)]
+        seed_sequences = np.random.SeedSequence(self.seed).spawn(len(block_sizes))
+
+        # Matrix products and bincount release the GIL, so blocks overlap across threads
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            blocks = executor.map(lambda args: self._replicate_block(sorted_values, *args),
+                                  zip(block_sizes, seed_sequences))
+            return np.concatenate(list(blocks), axis=0)
+
+def summarise_replicates(estimates, replicates, confidence=DEFAULT_CONFIDENCE):
+    """Point estimate, standard error and percentile interval per statistic"""
+
+    alpha = (1 - confidence) / 2
+    lower, upper = np.nanpercentile(replicates, [100 * alpha, 100 * (1 - alpha)], axis=0)
+    return {
+        'estimate': np.ravel(estimates),
+        'std_error': np.ravel(np.nanstd(replicates, axis=0, ddof=1)),
+        'ci_lower': np.ravel(lower),
+        'ci_upper': np.ravel(upper),
+    }
+
+def safe_divide(numerator, denominator):
+    """Element-wise ratio with NaN where the denominator is zero"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+def bootstrap_statistics(df_simplified, prefix, n_replicates=DEFAULT_REPLICATES, block_size=DEFAULT_BLOCK_SIZE,
+                         seed=DEFAULT_BOOTSTRAP_SEED, confidence=DEFAULT_CONFIDENCE, workers=None):
+    """Bootstrap confidence intervals for one census year
+
+    - total of every employment and firm count column
+    - mean of every numeric column
+    - share of total employment in every other employment column (female, formal, each group, ...)
+    - share of national employment and firms in each state
+    """
+
+    columns = [column for column in df_simplified.columns
+               if column != 'shrid2' and pd.api.types.is_numeric_dtype(df_simplified[column])]
+    count_columns = [column for column in columns if column.startswith((f'{prefix}_emp_', f'{prefix}_count_'))]
+    share_columns = [column for column in count_columns
+                     if column.startswith(f'{prefix}_emp_') and column != f'{prefix}_emp_all']
+    state_columns = [column for column in [f'{prefix}_emp_all', f'{prefix}_count_all'] if column in columns]
+
+    values = df_simplified[columns].to_numpy(dtype=float)
+    n_units = len(values)
+    position = {column: i for i, column in enumerate(columns)}
+
+    bootstrap = StratifiedBootstrap(extract_state_id(df_simplified['shrid2']), n_replicates, block_size, seed, workers)
+    print(f"Bootstrapping {prefix.upper()}: {n_replicates:,} replicates over {n_units:,} units "
+          f"in {len(bootstrap.labels)} states...")
+
+    # Stratum sizes are fixed, so every replicate has n_units units and all statistics follow from stratum totals
+    observed = bootstrap.stratum_totals(values)[None]
+    replicated = bootstrap.replicate_stratum_totals(values)
+
+    rows = []
+
+    def add_rows(statistic, labels, states, compute):
+        summary = summarise_replicates(compute(observed)[0], compute(replicated), confidence)
+        rows.append(pd.DataFrame({'dataset': prefix, 'statistic': statistic, 'column': labels,
+                                  'state': states, **summary}))
+
+    count_positions = [position[column] for column in count_columns]
+    add_rows('total', count_columns, 'ALL', lambda totals: totals.sum(axis=1)[:, count_positions])
+    add_rows('mean', columns, 'ALL', lambda totals: totals.sum(axis=1) / n_units)
+
+    if f'{prefix}_emp_all' in position and share_columns:
+        share_positions = [position[column] for column in share_columns]
+        emp_all_position = position[f'{prefix}_emp_all']
+        add_rows('employment_share', share_columns, 'ALL',
+                 lambda totals: safe_divide(totals.sum(axis=1)[:, share_positions],
+                                            totals.sum(axis=1)[:, [emp_all_position]]))
+
+    for column in state_columns:
+        column_position = position[column]
+        add_rows('state_share', column, bootstrap.labels.astype(str),
+                 lambda totals: safe_divide(totals[:, :, column_position],
+                                            totals[:, :, column_position].sum(axis=1, keepdims=True)))
+
+    return pd.concat(rows, ignore_index=True)
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Bootstrap confidence intervals for simplified census outputs")
+    parser.add_argument('csv_files', nargs='+', type=Path, help='Simplified CSV files (e.g. ec13_shrid_simplified.csv)')
+    parser.add_argument('--replicates', type=int, default=DEFAULT_REPLICATES,
+                        help=f'Number of bootstrap replicates (default: {DEFAULT_REPLICATES})')
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE,
+                        help=f'Replicates generated at once; bounds memory (default: {DEFAULT_BLOCK_SIZE})')
+    parser.add_argument('--seed', type=int, default=DEFAULT_BOOTSTRAP_SEED, help='Random seed')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE, help='Interval level (default: 0.95)')
+    parser.add_argument('--output', type=Path, default=None, help='Optional CSV file for the intervals')
+    return parser.parse_args()
+
+def main():
+    """Print (or save) bootstrap intervals for the given simplified outputs"""
+    args = parse_args()
+
+    results = []
+    for csv_file in args.csv_files:
+        prefix = csv_file.name.split('_')[0]
+        df_simplified = pd.read_csv(csv_file, dtype={'shrid2': str})
+        results.append(bootstrap_statistics(df_simplified, prefix, args.replicates, args.block_size,
+                                            args.seed, args.confidence))
+
+    intervals = pd.concat(results, ignore_index=True)
+    if args.output:
+        intervals.to_csv(args.output, index=False)
+        print(f"Saved {len(intervals):,} intervals to {args.output}")
+    else:
+        print(intervals.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Lazy access to the cleaned Economic Census outputs
+Opening a CensusDataset only lists the available years; columns are read from disk on first
+access (from the ecXX_columns/ store, or the simplified CSV for older outputs) and kept in an
+LRU cache with a memory bound
+
+Example:
+    dataset = CensusDataset()
+    dataset.years                                            # ['ec98', 'ec05', 'ec13']
+    emp = dataset.column('ec13', 'ec13_emp_all')             # numpy array, cached
+    units = dataset.lookup('ec13', ['11-09-151-00829-000123'], ['ec13_emp_all'])
+    urban = dataset['ec13'].filter(dataset.column('ec13', 'ec13_emp_all') > 500)
+    urban.to_frame(['shrid2', 'ec13_formal_employment_ratio'])
+"""
+
+from collections import OrderedDict
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+from column_store import get_column_store_dir, list_columns
+from shrid_utils import CENSUS_YEARS
+
+# Define paths
+CLEANED_FILES_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\processed\cleaned_files")
+
+DEFAULT_CACHE_BYTES = 1024 ** 3  # 1 GB
+
+class ColumnCache:
+    """Least-recently-used cache of column arrays bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.columns = OrderedDict()
+
+    def get(self, key):
+        if key not in self.columns:
+            return None
+        self.columns.move_to_end(key)
+        return self.columns[key]
+
+    def put(self, key, values):
+        # Columns larger than the whole cache are returned to the caller but not kept
+        if values.nbytes > self.max_bytes:
+            return
+        self.columns[key] = values
+        self.current_bytes += values.nbytes
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self.columns.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+
+    def clear(self):
+        self.columns.clear()
+        self.current_bytes = 0
+
+class CensusDataset:
+    """All census years in a cleaned_files directory, loaded column by column on demand"""
+
+    def __init__(self, cleaned_dir=CLEANED_FILES_DIR, max_cache_bytes=DEFAULT_CACHE_BYTES):
+        self.cleaned_dir = Path(cleaned_dir)
+        self.cache = ColumnCache(max_cache_bytes)
+        self._columns = {}
+        self._unit_indexes = {}
+
+        # Only check which files exist - no data is read here
+        self.years = [prefix for prefix in CENSUS_YEARS
+                      if get_column_store_dir(self.cleaned_dir, prefix).is_dir()
+                      or self.get_csv_file(prefix).exists()]
+
+    def __repr__(self):
+        return f"CensusDataset({str(self.cleaned_dir)!r}, years={self.years})"
+
+    def __getitem__(self, year):
+        return CensusView(self, year)
+
+    def get_csv_file(self, year):
+        return self.cleaned_dir / f"{year}_shrid_simplified.csv"
+
+    def check_year(self, year):
+        if year not in self.years:
+            raise KeyError(f"Census year '{year}' not found in {self.cleaned_dir} (available: {self.years})")
+
+    def columns(self, year):
+        """Column names of one census year in file order (reads only the column manifest or the CSV header)"""
+
+        self.check_year(year)
+        if year not in self._columns:
+            store_dir = get_column_store_dir(self.cleaned_dir, year)
+            if store_dir.is_dir():
+                self._columns[year] = list_columns(store_dir)
+            else:
+                self._columns[year] = list(pd.read_csv(self.get_csv_file(year), nrows=0).columns)
+        return self._columns[year]
+
+    def read_column(self, year, name):
+        """Read one column from disk (no caching)"""
+
+        store_file = get_column_store_dir(self.cleaned_dir, year) / f"{name}.npy"
+        if store_file.exists():
+            values = np.load(store_file)
+            return values.astype(str) if name == 'shrid2' else values
+
+        column = pd.read_csv(self.get_csv_file(year), usecols=[name], dtype={'shrid2': str})[name]
+        return column.to_numpy(dtype=str) if name == 'shrid2' else column.to_numpy()
+
+    def column(self, year, name):
+        """One column as a numpy array, read on first access and cached afterwards"""
+
+        self.check_year(year)
+        if name not in self.columns(year):
+            raise KeyError(f"Column '{name}' not found for {year}")
+
+        values = self.cache.get((year, name))
+        if values is None:
+            values = self.read_column(year, name)
+            values.setflags(write=False)  # cached arrays are shared between callers
+            self.cache.put((year, name), values)
+        return values
+
+    def shrid2(self, year):
+        return self.column(year, 'shrid2')
+
+    def get_positions(self, year, shrid2):
+        """Row positions of a list of shrid2 values"""
+
+        if year not in self._unit_indexes:
+            self._unit_indexes[year] = pd.Index(self.shrid2(year))
+
+        positions = self._unit_indexes[year].get_indexer(np.atleast_1d(np.asarray(shrid2, dtype=str)))
+        if (positions < 0).any():
+            raise KeyError(f"{(positions < 0).sum()} shrid2 values not found for {year}")
+        return positions
+
+    def lookup(self, year, shrid2, columns=None):
+        """Rows for the given shrid2 values (all columns unless a subset is given)"""
+        return CensusView(self, year, self.get_positions(year, shrid2)).to_frame(columns)
+
+class CensusView:
+    """A (possibly filtered) view of one census year that stores row positions, not data
+
+    Columns are gathered from the dataset's cache only when they are accessed.
+    """
+
+    def __init__(self, dataset, year, positions=None):
+        dataset.check_year(year)
+        self.dataset = dataset
+        self.year = year
+        self.positions = positions
+
+    def __len__(self):
+        if self.positions is None:
+            return len(self.dataset.shrid2(self.year))
+        return len(self.positions)
+
+    def __repr__(self):
+        return f"CensusView({self.year!r}, units={len(self):,})"
+
+    @property
+    def columns(self):
+        return self.dataset.columns(self.year)
+
+    def column(self, name):
+        """Values of one column for the units in the view"""
+        values = self.dataset.column(self.year, name)
+        return values if self.positions is None else values[self.positions]
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def filter(self, mask):
+        """Narrow the view with a boolean mask over its current units"""
+
+        mask = np.asarray(mask, dtype=bool)
+        if len(mask) != len(self):
+            raise ValueError(f"Mask has {len(mask)} values but the view has {len(self)} units")
+
+        selected = np.flatnonzero(mask)
+        positions = selected if self.positions is None else self.positions[selected]
+        return CensusView(self.dataset, self.year, positions)
+
+    def to_frame(self, columns=None):
+        """Materialise the view as a DataFrame (only the requested columns are read)"""
+
+        columns = columns or self.columns
+        return pd.DataFrame({name: self.column(name) for name in columns})
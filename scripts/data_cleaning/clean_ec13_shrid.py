@@ -3,15 +3,32 @@ Script to clean and simplify ec13_shrid.csv file for market segmentation
 Groups 90 SHRIC codes into meaningful industry categories
 """
 
+import argparse
+
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from bitmap_index import build_bitmap_index
+from column_store import write_column_store
+from diversity_metrics import add_concentration_features, get_concentration_documentation
+from feature_matrix import check_feature_columns
+from normalisation import normalise_simplified_output
+from pipeline import DEFAULT_QUEUE_DEPTH, ChunkWriter, PrefetchingReader, add_pipeline_arguments
+from raw_sources import find_raw_source, open_raw_source
+from sampling import add_sample_arguments, create_sampler
+from shric_colocation import ShricColocationAccumulator
+from shric_store import ShricStoreBuilder
+from similarity_search import SimilarityIndex, get_similarity_index_file
+from visualization_aggregates import build_visualization_aggregates
+
 # Define paths
 RAW_DATA_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\raw")
 PROCESSED_DATA_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\processed")
 CLEANED_FILES_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\processed\cleaned_files")
 SHRIC_DESC_FILE = Path(r"d:\BDA_project\BDA_project\prithvi_rand\shric_descriptions.csv")
+VISUALIZATION_DATA_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\visualizations\aggregates")
+SAMPLED_FILES_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\processed\sampled_files")
 
 # Ensure directories exist
 PROCESSED_DATA_DIR.mkdir(exist_ok=True)
@@ -66,29 +83,39 @@ def define_industry_groups():
     
     return industry_groups
 
-def load_and_clean_ec13_data():
-    """Load and clean the ec13_shrid.csv file"""
+def iter_ec13_chunks(sampler=None, queue_depth=DEFAULT_QUEUE_DEPTH):
+    """Stream chunks of the ec13_shrid.csv file, read ahead by a background thread
+    
+    The file can be the extracted CSV or a .zip/.gz/.zst SHRUG download, which is decompressed
+    on the fly. With a sampler the whole file streams through it and the sample is yielded as
+    a single chunk.
+    """
     
     # Load the data
-    file_path = RAW_DATA_DIR / "shrug-ec13-csv" / "ec13_shrid.csv"
+    file_path = find_raw_source(RAW_DATA_DIR, 'ec13')
     print(f"Loading data from {file_path}")
     
     # Read data in chunks to handle large file
     chunk_size = 10000
-    chunks = []
-    
-    for chunk in pd.read_csv(file_path, chunksize=chunk_size):
-        chunks.append(chunk)
-    
-    df = pd.concat(chunks, ignore_index=True)
-    print(f"Loaded {len(df):,} records with {len(df.columns)} columns")
-    
-    return df
+    with open_raw_source(file_path, member_name="ec13_shrid.csv") as raw_file:
+        reader = PrefetchingReader(pd.read_csv(raw_file, chunksize=chunk_size), queue_depth)
+        
+        if sampler is None:
+            yield from reader
+            return
+        
+        for chunk in reader:
+            sampler.add_chunk(chunk)
+        yield sampler.finalize()
 
-def simplify_ec13_data(df):
-    """Simplify the EC13 data by grouping SHRIC codes and removing unnecessary columns"""
+def simplify_ec13_data(df, verbose=True):
+    """Simplify the EC13 data by grouping SHRIC codes and removing unnecessary columns
     
-    print("Starting data simplification...")
+    Every feature is computed row by row, so the data can be simplified one chunk at a time
+    """
+    
+    if verbose:
+        print("Starting data simplification...")
     
     # 1. Keep essential identifier and aggregate columns
     core_columns = [
@@ -125,10 +152,12 @@ def simplify_ec13_data(df):
         
         if existing_shric_columns:
             df_simplified[f'ec13_emp_{group_name}'] = df[existing_shric_columns].sum(axis=1)
-            print(f"Created {group_name} employment from {len(existing_shric_columns)} SHRIC codes")
+            if verbose:
+                print(f"Created {group_name} employment from {len(existing_shric_columns)} SHRIC codes")
     
     # 4. Create derived market segmentation features
-    print("Creating derived features for market segmentation...")
+    if verbose:
+        print("Creating derived features for market segmentation...")
     
     # Economic diversity score (number of industry groups with employment > 0)
     industry_emp_columns = [col for col in df_simplified.columns if col.startswith('ec13_emp_') and 'group' not in col and col not in existing_core_columns]
@@ -188,19 +217,18 @@ def simplify_ec13_data(df):
             df_simplified['ec13_emp_all'].replace(0, np.nan)
         ).fillna(0)
     
-    print(f"Simplified dataset: {len(df_simplified)} rows, {len(df_simplified.columns)} columns")
-    print(f"Reduced from {len(df.columns)} to {len(df_simplified.columns)} columns")
-    print(f"Reduction: {100 * (1 - len(df_simplified.columns)/len(df.columns)):.1f}%")
+    # Industry concentration (entropy / HHI) at SHRIC and industry group resolution
+    add_concentration_features(df_simplified, df, 'ec13', industry_groups)
+    
+    if verbose:
+        print(f"Simplified dataset: {len(df_simplified)} rows, {len(df_simplified.columns)} columns")
+        print(f"Reduced from {len(df.columns)} to {len(df_simplified.columns)} columns")
+        print(f"Reduction: {100 * (1 - len(df_simplified.columns)/len(df.columns)):.1f}%")
     
     return df_simplified
 
-def save_simplified_data(df_simplified):
-    """Save the simplified data to cleaned_files directory"""
-    
-    # Save main simplified file to cleaned_files directory
-    output_file = CLEANED_FILES_DIR / "ec13_shrid_simplified.csv"
-    df_simplified.to_csv(output_file, index=False)
-    print(f"Saved simplified data to {output_file}")
+def write_column_documentation(df_simplified, output_dir=CLEANED_FILES_DIR):
+    """Save the column documentation for the simplified data"""
     
     # Create column documentation
     industry_groups = define_industry_groups()
@@ -227,6 +255,8 @@ def save_simplified_data(df_simplified):
         ('ec13_formal_employment_ratio', 'Formal sector employment as % of total', 'Economic Formalization')
     ]
     
+    derived_features += get_concentration_documentation('ec13')
+    
     for col_name, description, var_type in derived_features:
         if col_name in df_simplified.columns:
             documentation.append({
@@ -237,33 +267,107 @@ def save_simplified_data(df_simplified):
             })
     
     doc_df = pd.DataFrame(documentation)
-    doc_file = CLEANED_FILES_DIR / "ec13_shrid_column_documentation.csv"
+    doc_file = output_dir / "ec13_shrid_column_documentation.csv"
     doc_df.to_csv(doc_file, index=False)
     print(f"Saved column documentation to {doc_file}")
     
-    return output_file
+    return doc_file
+
+def process_ec13_data(output_dir, sampler=None, queue_depth=DEFAULT_QUEUE_DEPTH):
+    """Read, simplify and write the EC13 data chunk by chunk with overlapping threads
+    
+    The reader thread parses the next chunks while the current one is simplified, and the
+    writer thread appends finished chunks to the output. Returns the simplified data and
+    the number of raw columns.
+    """
+    
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / "ec13_shrid_simplified.csv"
+    
+    shric_builder = ShricStoreBuilder('ec13')
+    colocation = ShricColocationAccumulator('ec13')
+    simplified_chunks = []
+    n_raw_columns = 0
+    
+    print("Starting data simplification...")
+    with ChunkWriter(output_file, queue_depth) as writer:
+        for chunk in iter_ec13_chunks(sampler, queue_depth):
+            n_raw_columns = len(chunk.columns)
+            
+            # Keep the full SHRIC detail before it is grouped away
+            shric_builder.add_chunk(chunk)
+            colocation.add_chunk(chunk)
+            
+            chunk_simplified = simplify_ec13_data(chunk, verbose=False)
+            if not simplified_chunks:
+                # Fail on the first chunk if the similarity / scenario feature lists drifted
+                check_feature_columns(chunk_simplified.columns, 'ec13', define_industry_groups())
+            writer.write(chunk_simplified)
+            simplified_chunks.append(chunk_simplified)
+    
+    df_simplified = pd.concat(simplified_chunks, ignore_index=True)
+    print(f"Simplified dataset: {len(df_simplified):,} rows, {len(df_simplified.columns)} columns")
+    print(f"Saved simplified data to {output_file}")
+    
+    # Persist the full SHRIC detail as a sparse matrix
+    shric_builder.build().save(output_dir / "ec13_shric_store.npz")
+    
+    # Industry co-location matrices from the same single read of the raw file
+    colocation.finalize().save(output_dir, 'ec13')
+    
+    return df_simplified, n_raw_columns
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Clean and simplify EC13 SHRID data")
+    add_sample_arguments(parser)
+    add_pipeline_arguments(parser)
+    return parser.parse_args()
 
 def main():
     """Main function to clean and simplify EC13 data"""
+    args = parse_args()
+    
     print("="*60)
     print("EC13 SHRID DATA CLEANING AND SIMPLIFICATION")
     print("="*60)
     
-    # Load data
-    df = load_and_clean_ec13_data()
+    # Sample runs write to a separate directory so they never overwrite production files
+    sampler = create_sampler(args)
+    if sampler is not None:
+        print(f"SAMPLE MODE: {sampler.describe()}")
+        output_dir = SAMPLED_FILES_DIR
+        visualization_dir = SAMPLED_FILES_DIR / "visualization_aggregates"
+    else:
+        output_dir = CLEANED_FILES_DIR
+        visualization_dir = VISUALIZATION_DATA_DIR
+    
+    # Load, simplify and save data in one pipelined pass
+    df_simplified, n_raw_columns = process_ec13_data(output_dir, sampler, args.queue_depth)
+    output_file = output_dir / "ec13_shrid_simplified.csv"
+    write_column_documentation(df_simplified, output_dir)
+    
+    # Bitmap indexes for fast predicate filtering on score, ratio and employment columns
+    build_bitmap_index(df_simplified, 'ec13').save(output_dir / "ec13_bitmap_index.npz")
+    
+    # Memory-mappable copy of every column for rankings and lazy column access
+    write_column_store(df_simplified, 'ec13', output_dir)
+    
+    # Robustly scaled float32 feature matrix, shared by the similarity index and the scenario engine
+    normalise_simplified_output(output_file, 'ec13', output_dir, queue_depth=args.queue_depth)
     
-    # Simplify data
-    df_simplified = simplify_ec13_data(df)
+    # Nearest-neighbour index for finding economically similar units
+    SimilarityIndex.build(output_dir, 'ec13').save(get_similarity_index_file(output_dir, 'ec13'))
     
-    # Save results
-    output_file = save_simplified_data(df_simplified)
+    # Precompute plot-ready aggregates for the visualizations folder
+    build_visualization_aggregates(df_simplified, 'ec13', visualization_dir)
     
     print("\n" + "="*60)
     print("CLEANING COMPLETE!")
     print("="*60)
-    print(f"Original columns: {len(df.columns)}")
+    print(f"Original columns: {n_raw_columns}")
     print(f"Simplified columns: {len(df_simplified.columns)}")
-    print(f"Reduction: {100 * (1 - len(df_simplified.columns)/len(df.columns)):.1f}%")
+    print(f"Reduction: {100 * (1 - len(df_simplified.columns)/n_raw_columns):.1f}%")
     print(f"Output file: {output_file}")
     print("\nKey improvements for market segmentation:")
     print("* Grouped 90 SHRIC codes into 14 meaningful industry categories")
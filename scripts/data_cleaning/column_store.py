@@ -0,0 +1,77 @@
+"""
+Columnar copy of the simplified outputs: one .npy file per column that can be memory-mapped
+Layout: cleaned_files/ec13_columns/shrid2.npy, cleaned_files/ec13_columns/ec13_emp_all.npy, ...
+plus columns.json, which lists the columns in the order of the simplified CSV
+
+Convert an existing simplified CSV:
+    python column_store.py ../../data/processed/cleaned_files/ec13_shrid_simplified.csv
+"""
+
+import argparse
+import json
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+KEY_COLUMN = 'shrid2'
+MANIFEST_FILE = 'columns.json'
+
+def get_column_store_dir(output_dir, prefix):
+    """Directory holding the column files of one census year"""
+    return Path(output_dir) / f"{prefix}_columns"
+
+def write_column_store(df_simplified, prefix, output_dir):
+    """Write every column of the simplified data as its own .npy file"""
+
+    store_dir = get_column_store_dir(output_dir, prefix)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    for column in df_simplified.columns:
+        if column == KEY_COLUMN:
+            # Fixed-width bytes so that the key column can be memory-mapped as well
+            values = df_simplified[column].to_numpy(dtype=str).astype(bytes)
+        else:
+            values = df_simplified[column].to_numpy()
+        np.save(store_dir / f"{column}.npy", values)
+
+    # Written last, so the manifest only lists columns whose files are complete
+    with open(store_dir / MANIFEST_FILE, 'w') as manifest:
+        json.dump(list(df_simplified.columns), manifest, indent=2)
+
+    print(f"Saved column store ({len(df_simplified.columns)} columns) to {store_dir}")
+    return store_dir
+
+def list_columns(store_dir):
+    """Names of the columns in a column store, in the order of the simplified CSV
+
+    Stores written before the manifest existed fall back to the sorted file names.
+    """
+
+    manifest_file = Path(store_dir) / MANIFEST_FILE
+    if manifest_file.exists():
+        with open(manifest_file) as manifest:
+            return json.load(manifest)
+    return sorted(path.stem for path in Path(store_dir).glob("*.npy"))
+
+def open_column(store_dir, column):
+    """Memory-map one column without reading it into memory"""
+
+    column_file = Path(store_dir) / f"{column}.npy"
+    if not column_file.exists():
+        raise KeyError(f"Column '{column}' is not in the column store {store_dir}")
+    return np.load(column_file, mmap_mode='r')
+
+def main():
+    """Convert simplified CSV outputs into column stores next to them"""
+    parser = argparse.ArgumentParser(description="Convert *_shrid_simplified.csv files into memory-mappable column stores")
+    parser.add_argument('csv_files', nargs='+', type=Path, help='Simplified CSV files (e.g. ec13_shrid_simplified.csv)')
+    args = parser.parse_args()
+
+    for csv_file in args.csv_files:
+        prefix = csv_file.name.split('_')[0]
+        print(f"Converting {csv_file}...")
+        write_column_store(pd.read_csv(csv_file, dtype={KEY_COLUMN: str}), prefix, csv_file.parent)
+
+if __name__ == "__main__":
+    main()
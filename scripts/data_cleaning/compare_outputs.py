@@ -0,0 +1,246 @@
+"""
+Fast output-equivalence checker for cleaning outputs (e.g. two versions of ec13_shrid_simplified.csv)
+Streams both files once, hashing every column per row keyed on shrid2, and only re-reads
+the columns whose hashes differ to report mismatch counts and sample keys. When the key sets
+differ, both files are digested again over their shared keys only
+
+Usage:
+    python compare_outputs.py old/ec13_shrid_simplified.csv new/ec13_shrid_simplified.csv
+    python compare_outputs.py old.csv new.parquet --tolerance 1e-9 --column-tolerance ec13_firm_density=1e-6
+"""
+
+import argparse
+import sys
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+DEFAULT_KEY = 'shrid2'
+DEFAULT_TOLERANCE = 1e-9
+CHUNK_SIZE = 100000
+SAMPLE_KEYS = 5
+
+# Odd 64-bit constant used to mix the key hash with each value hash
+HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+def iter_chunks(path, columns=None, chunk_size=CHUNK_SIZE, key=DEFAULT_KEY):
+    """Stream a CSV or Parquet output in chunks of DataFrames"""
+
+    path = Path(path)
+
+    if path.suffix == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Comparing Parquet files requires pyarrow (conda install pyarrow)")
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            chunk = batch.to_pandas()
+            chunk[key] = chunk[key].astype(str)
+            yield chunk
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size, dtype={key: str})
+
+def read_column_names(path):
+    """Column names of a CSV or Parquet output without reading the data"""
+
+    path = Path(path)
+    if path.suffix == '.parquet':
+        import pyarrow.parquet as pq
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def hash_values(values, tolerance):
+    """uint64 hash per value; numeric values are quantised to the tolerance first"""
+
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        numbers = values.to_numpy(dtype=float)
+        if tolerance > 0:
+            # Values within the same tolerance bucket hash equal; values that straddle a bucket
+            # edge are caught (and cleared) by the exact comparison pass
+            numbers = np.round(numbers / tolerance)
+        numbers = np.where(numbers == 0, 0.0, numbers)  # -0.0 and 0.0 hash equal
+        return pd.util.hash_array(numbers)
+
+    return pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+
+def compute_digests(path, columns, key, tolerances, default_tolerance, keys=None):
+    """One streaming pass: order-independent digests per column and for the key set
+
+    Each column digest is the wrapping sum over rows of hash(key) mixed with hash(value), so it does
+    not depend on row order - equivalent to key-sorting both files without the sort.
+    keys: optional pandas Index; only rows with these keys are digested.
+    """
+
+    column_digests = dict.fromkeys(columns, np.uint64(0))
+    key_digest = np.uint64(0)
+    n_rows = 0
+
+    with np.errstate(over='ignore'):
+        for chunk in iter_chunks(path, [key] + columns, key=key):
+            if keys is not None:
+                chunk = chunk[keys.get_indexer(chunk[key]) >= 0]
+            key_hashes = pd.util.hash_array(chunk[key].to_numpy(dtype=object))
+
+            for column in columns:
+                value_hashes = hash_values(chunk[column], tolerances.get(column, default_tolerance))
+                cell_hashes = (key_hashes * HASH_MIX) ^ value_hashes
+                column_digests[column] += cell_hashes.sum(dtype=np.uint64)
+
+            key_digest += key_hashes.sum(dtype=np.uint64)
+            n_rows += len(chunk)
+
+    return {
+        'rows': n_rows,
+        'keys': key_digest,
+        'columns': column_digests,
+    }
+
+def read_columns(path, key, columns):
+    """Read the key and a subset of columns (used only for columns whose digests differ)"""
+    return pd.concat(iter_chunks(path, [key] + columns, key=key), ignore_index=True).set_index(key)
+
+def compare_column(left, right, column, tolerance, n_samples=SAMPLE_KEYS):
+    """Exact comparison of one key-aligned column within the tolerance"""
+
+    if pd.api.types.is_numeric_dtype(left) and pd.api.types.is_numeric_dtype(right):
+        left_values = left.to_numpy(dtype=float)
+        right_values = right.to_numpy(dtype=float)
+        matches = np.isclose(left_values, right_values, rtol=0, atol=tolerance, equal_nan=True)
+        differences = np.abs(left_values - right_values)[~matches]
+        max_difference = np.nanmax(differences) if len(differences) else 0.0
+    else:
+        matches = (left.astype(str) == right.astype(str)).to_numpy()
+        max_difference = np.nan
+
+    mismatched_keys = left.index[~matches]
+    return {
+        'column': column,
+        'mismatches': int((~matches).sum()),
+        'max_abs_difference': max_difference,
+        'tolerance': tolerance,
+        'sample_keys': ', '.join(map(str, mismatched_keys[:n_samples])),
+    }
+
+def compare_columns(left_path, right_path, key, columns, tolerances, default_tolerance, n_samples=SAMPLE_KEYS):
+    """Read the suspect columns from both files once, align them on the key and compare exactly"""
+
+    left, right = read_columns(left_path, key, columns).align(read_columns(right_path, key, columns), join='inner')
+
+    results = [compare_column(left[column], right[column], column,
+                              tolerances.get(column, default_tolerance), n_samples)
+               for column in columns]
+    return [result for result in results if result['mismatches']]
+
+def compare_keys(left_path, right_path, key, n_samples=SAMPLE_KEYS):
+    """Report keys that only exist on one side and return the keys found in both files"""
+
+    left_keys = pd.Index(pd.concat(iter_chunks(left_path, [key], key=key))[key])
+    right_keys = pd.Index(pd.concat(iter_chunks(right_path, [key], key=key))[key])
+
+    only_left = left_keys.difference(right_keys)
+    only_right = right_keys.difference(left_keys)
+    duplicates = int(left_keys.duplicated().sum() + right_keys.duplicated().sum())
+
+    print(f"Keys only in left: {len(only_left):,} (e.g. {', '.join(only_left[:n_samples])})")
+    print(f"Keys only in right: {len(only_right):,} (e.g. {', '.join(only_right[:n_samples])})")
+    if duplicates:
+        print(f"Duplicated keys: {duplicates:,}")
+
+    return left_keys.intersection(right_keys)
+
+def compare_outputs(left_path, right_path, key=DEFAULT_KEY, tolerance=DEFAULT_TOLERANCE,
+                    column_tolerances=None, n_samples=SAMPLE_KEYS):
+    """Compare two outputs; returns (is_equivalent, report DataFrame of mismatched columns)"""
+
+    column_tolerances = column_tolerances or {}
+
+    left_columns = read_column_names(left_path)
+    right_columns = read_column_names(right_path)
+    common_columns = [col for col in left_columns if col in right_columns and col != key]
+
+    only_left = [col for col in left_columns if col not in right_columns]
+    only_right = [col for col in right_columns if col not in left_columns]
+    if only_left:
+        print(f"Columns only in left: {only_left}")
+    if only_right:
+        print(f"Columns only in right: {only_right}")
+
+    left_digests = compute_digests(left_path, common_columns, key, column_tolerances, tolerance)
+    right_digests = compute_digests(right_path, common_columns, key, column_tolerances, tolerance)
+
+    print(f"Rows: {left_digests['rows']:,} (left) vs {right_digests['rows']:,} (right)")
+
+    keys_match = left_digests['keys'] == right_digests['keys']
+    if not keys_match:
+        # Every cell hash includes its key, so digest both files again over the shared keys only;
+        # otherwise a single missing key would make every column suspect
+        shared_keys = compare_keys(left_path, right_path, key, n_samples)
+        print(f"Comparing values on the {len(shared_keys):,} shared keys...")
+        left_digests = compute_digests(left_path, common_columns, key, column_tolerances, tolerance, shared_keys)
+        right_digests = compute_digests(right_path, common_columns, key, column_tolerances, tolerance, shared_keys)
+
+    suspect_columns = [col for col in common_columns
+                       if left_digests['columns'][col] != right_digests['columns'][col]]
+
+    # Hash differences can be tolerance-bucket edge effects or missing keys - confirm exactly
+    report = []
+    if suspect_columns:
+        report = compare_columns(left_path, right_path, key, suspect_columns,
+                                 column_tolerances, tolerance, n_samples)
+
+    report_df = pd.DataFrame(report, columns=['column', 'mismatches', 'max_abs_difference', 'tolerance', 'sample_keys'])
+    is_equivalent = bool(keys_match and not only_left and not only_right and report_df.empty)
+
+    return is_equivalent, report_df
+
+def parse_column_tolerance(value):
+    """Parse COLUMN=TOLERANCE"""
+    try:
+        column, tolerance = value.rsplit('=', 1)
+        return column, float(tolerance)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected COLUMN=TOLERANCE, got '{value}'")
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Check that two cleaning outputs are equivalent")
+    parser.add_argument('left', type=Path, help='Reference output (CSV or Parquet)')
+    parser.add_argument('right', type=Path, help='Output to check (CSV or Parquet)')
+    parser.add_argument('--key', default=DEFAULT_KEY, help=f'Unit key column (default: {DEFAULT_KEY})')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Absolute tolerance for numeric columns (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--column-tolerance', type=parse_column_tolerance, action='append', default=[],
+                        help='Per-column absolute tolerance, e.g. ec13_firm_density=1e-6 (repeatable)')
+    parser.add_argument('--samples', type=int, default=SAMPLE_KEYS, help='Number of sample keys to report')
+    parser.add_argument('--report', type=Path, default=None, help='Optional CSV file for the mismatch report')
+    return parser.parse_args()
+
+def main():
+    """Compare two outputs and exit with status 1 if they differ"""
+    args = parse_args()
+
+    print("="*60)
+    print("OUTPUT EQUIVALENCE CHECK")
+    print("="*60)
+    print(f"Left:  {args.left}")
+    print(f"Right: {args.right}")
+
+    is_equivalent, report_df = compare_outputs(
+        args.left, args.right, key=args.key, tolerance=args.tolerance,
+        column_tolerances=dict(args.column_tolerance), n_samples=args.samples
+    )
+
+    if not report_df.empty:
+        print("\nMismatched columns:")
+        print(report_df.to_string(index=False))
+        if args.report is not None:
+            report_df.to_csv(args.report, index=False)
+            print(f"\nMismatch report saved to {args.report}")
+
+    print("\n" + ("EQUIVALENT" if is_equivalent else "DIFFERENT"))
+    return 0 if is_equivalent else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
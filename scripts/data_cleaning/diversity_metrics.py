@@ -0,0 +1,66 @@
+"""
+Industry concentration metrics per unit: Shannon entropy, Herfindahl-Hirschman index (HHI) and
+effective number of industries (1 / HHI), at full SHRIC resolution and at industry group level
+Computed row by row, so they are added to each chunk in the same pass that builds the group columns
+"""
+
+import numpy as np
+
+from shric_store import SHRIC_CODES, get_shric_column_name
+
+CONCENTRATION_RESOLUTIONS = ['shric', 'group']
+
+def compute_concentration(values):
+    """Entropy, HHI and effective number of industries for each row of an employment matrix
+
+    Units without employment get 0 for all three metrics.
+    """
+
+    values = np.clip(np.nan_to_num(np.asarray(values, dtype=float)), 0, None)
+    totals = values.sum(axis=1, keepdims=True)
+
+    shares = np.divide(values, totals, out=np.zeros_like(values), where=totals > 0)
+    log_shares = np.log(shares, out=np.zeros_like(shares), where=shares > 0)
+
+    entropy = -(shares * log_shares).sum(axis=1) + 0.0  # + 0.0 turns -0.0 into 0.0
+    hhi = (shares ** 2).sum(axis=1)
+    effective_industries = np.divide(1.0, hhi, out=np.zeros_like(hhi), where=hhi > 0)
+
+    return entropy, hhi, effective_industries
+
+def add_concentration_features(df_simplified, df, prefix, industry_groups):
+    """Add entropy / HHI / effective industries columns at SHRIC and group resolution"""
+
+    shric_columns = [get_shric_column_name(prefix, code) for code in SHRIC_CODES]
+    group_columns = [f'{prefix}_emp_{group_name}' for group_name in industry_groups]
+
+    matrices = {
+        'shric': df[[col for col in shric_columns if col in df.columns]],
+        'group': df_simplified[[col for col in group_columns if col in df_simplified.columns]],
+    }
+
+    for resolution in CONCENTRATION_RESOLUTIONS:
+        if matrices[resolution].shape[1] == 0:
+            continue
+        entropy, hhi, effective_industries = compute_concentration(matrices[resolution].to_numpy())
+        df_simplified[f'{prefix}_{resolution}_entropy'] = entropy
+        df_simplified[f'{prefix}_{resolution}_hhi'] = hhi
+        df_simplified[f'{prefix}_{resolution}_effective_industries'] = effective_industries
+
+    return df_simplified
+
+def get_concentration_documentation(prefix):
+    """(column, description, variable type) entries for the column documentation"""
+
+    levels = {'shric': '90 SHRIC codes', 'group': '14 industry groups'}
+    documentation = []
+    for resolution in CONCENTRATION_RESOLUTIONS:
+        documentation += [
+            (f'{prefix}_{resolution}_entropy', f'Shannon entropy of employment shares across the {levels[resolution]}',
+             'Industry Concentration'),
+            (f'{prefix}_{resolution}_hhi', f'Herfindahl-Hirschman index of employment shares across the {levels[resolution]}',
+             'Industry Concentration'),
+            (f'{prefix}_{resolution}_effective_industries', f'Effective number of industries (1 / HHI) across the {levels[resolution]}',
+             'Industry Concentration'),
+        ]
+    return documentation
@@ -0,0 +1,94 @@
+"""
+Per-unit feature vectors built from the simplified Economic Census outputs
+14 industry group employment shares plus the derived market segmentation indicators. The share
+columns are added to the persisted feature matrix (see normalisation.py), so the similarity index
+and the scenario engine read already scaled features from ecXX_feature_matrix.npy
+"""
+
+import pandas as pd
+import numpy as np
+
+# Same groups (and order) as define_industry_groups() in the cleaning scripts; check_feature_columns
+# fails the cleaning run when they drift apart
+INDUSTRY_GROUP_NAMES = [
+    'primary_industries',
+    'food_agriculture',
+    'manufacturing_traditional',
+    'manufacturing_industrial',
+    'manufacturing_consumer',
+    'utilities_infrastructure',
+    'automotive_transport',
+    'wholesale_trade',
+    'retail_consumer',
+    'communication_digital',
+    'financial_services',
+    'business_services',
+    'social_services',
+    'entertainment_culture',
+]
+
+# Derived indicators (without the ecXX_ prefix)
+DERIVED_FEATURES = [
+    'economic_diversity_score',
+    'non_farm_employment_ratio',
+    'firm_density',
+    'employment_per_firm',
+    'retail_diversity',
+    'service_sophistication_score',
+    'female_employment_ratio',
+    'formal_employment_ratio',
+]
+
+# Feature names used by the similarity index and scenario weights; matrix columns add the ecXX_ prefix
+FEATURE_NAMES = [f'{group_name}_share' for group_name in INDUSTRY_GROUP_NAMES] + DERIVED_FEATURES
+
+def check_feature_columns(columns, prefix, industry_groups):
+    """Raise if the simplified columns no longer match INDUSTRY_GROUP_NAMES / DERIVED_FEATURES
+
+    industry_groups: the define_industry_groups() dict of the cleaning script
+    """
+
+    if list(industry_groups) != INDUSTRY_GROUP_NAMES:
+        raise ValueError(f"feature_matrix.INDUSTRY_GROUP_NAMES {INDUSTRY_GROUP_NAMES} does not match the "
+                         f"cleaning script groups {list(industry_groups)} - update feature_matrix.py")
+
+    expected = ([f'{prefix}_emp_{group_name}' for group_name in INDUSTRY_GROUP_NAMES]
+                + [f'{prefix}_{feature}' for feature in DERIVED_FEATURES])
+    missing = [column for column in expected if column not in columns]
+    if missing:
+        raise ValueError(f"Simplified {prefix} output is missing feature columns {missing} - update feature_matrix.py")
+
+def add_share_columns(df_simplified, prefix):
+    """Add the employment share of every industry group (ecXX_<group>_share, 0 without employment)"""
+
+    emp_all = df_simplified[f'{prefix}_emp_all'].to_numpy(dtype=float)
+    safe_emp_all = np.where(emp_all > 0, emp_all, np.nan)
+
+    shares = {}
+    for group_name in INDUSTRY_GROUP_NAMES:
+        column = f'{prefix}_emp_{group_name}'
+        if column in df_simplified.columns:
+            share = df_simplified[column].to_numpy(dtype=float) / safe_emp_all
+            shares[f'{prefix}_{group_name}_share'] = np.nan_to_num(share)
+
+    return df_simplified.assign(**shares)
+
+def get_feature_columns(prefix, available=None):
+    """Matrix columns of the features (optionally only those in `available`), in FEATURE_NAMES order"""
+
+    columns = [f'{prefix}_{name}' for name in FEATURE_NAMES]
+    return columns if available is None else [column for column in columns if column in set(available)]
+
+def get_feature_name(column, prefix):
+    """Feature name of a matrix column (ec13_firm_density -> firm_density)"""
+    return column[len(prefix) + 1:]
+
+def build_feature_frame(df_simplified, prefix):
+    """Unscaled feature vectors per unit, indexed by shrid2 and named as in FEATURE_NAMES"""
+
+    df_features = add_share_columns(df_simplified, prefix)
+    columns = get_feature_columns(prefix, df_features.columns)
+    features = df_features[columns].fillna(0)
+    features.columns = [get_feature_name(column, prefix) for column in columns]
+    features.index = pd.Index(df_features['shrid2'].astype(str), name='shrid2')
+    return features
@@ -0,0 +1,222 @@
+"""
+Robust feature normalisation for the simplified Economic Census outputs
+One streaming pass over ecXX_shrid_simplified.csv (plus the industry group share columns of
+feature_matrix.py) collects moments and a seeded reservoir sample per column. These give
+log-transform flags, winsorisation bounds and median / IQR scaling. The parameters are saved as
+JSON and the scaled data as a float32 .npy matrix that downstream tools memory-map (the
+similarity index and the scenario engine read their features from it)
+
+Usage:
+    python normalisation.py ../../data/processed/cleaned_files/ec13_shrid_simplified.csv
+"""
+
+import argparse
+import json
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+from feature_matrix import add_share_columns
+from pipeline import DEFAULT_QUEUE_DEPTH, PrefetchingReader
+
+CHUNK_SIZE = 50000
+RESERVOIR_SIZE = 100000
+DEFAULT_NORMALISATION_SEED = 42
+
+# Non-negative columns more skewed than this are log1p-transformed
+LOG_SKEW_THRESHOLD = 2.0
+WINSOR_QUANTILES = (0.005, 0.995)
+
+def get_feature_matrix_files(output_dir, prefix):
+    """Matrix, row key and scaler parameter files of one census year"""
+    output_dir = Path(output_dir)
+    return (output_dir / f"{prefix}_feature_matrix.npy",
+            output_dir / f"{prefix}_feature_matrix_shrid2.npy",
+            output_dir / f"{prefix}_scaler.json")
+
+class StreamingStatistics:
+    """Moments and a reservoir sample of every column, updated chunk by chunk"""
+
+    def __init__(self, columns, reservoir_size=RESERVOIR_SIZE, seed=DEFAULT_NORMALISATION_SEED):
+        self.columns = columns
+        self.n_rows = 0
+        self.minimum = np.full(len(columns), np.inf)
+        self.maximum = np.full(len(columns), -np.inf)
+        self.power_sums = np.zeros((3, len(columns)))  # sums of x, x^2, x^3
+        self.reservoir = np.empty((reservoir_size, len(columns)))
+        self.rng = np.random.default_rng(seed)
+
+    def add_chunk(self, values):
+        """Update the statistics with a float matrix of chunk rows"""
+
+        n_chunk = len(values)
+        if n_chunk == 0:
+            return
+
+        self.minimum = np.minimum(self.minimum, values.min(axis=0))
+        self.maximum = np.maximum(self.maximum, values.max(axis=0))
+        for power in range(3):
+            self.power_sums[power] += (values ** (power + 1)).sum(axis=0)
+
+        # Reservoir sampling over rows: row i replaces a random slot with probability size / (i + 1)
+        reservoir_size = len(self.reservoir)
+        row_numbers = self.n_rows + np.arange(n_chunk)
+        fill = row_numbers < reservoir_size
+        self.reservoir[row_numbers[fill]] = values[fill]
+
+        slots = self.rng.integers(0, row_numbers[~fill] + 1)
+        replace = slots < reservoir_size
+        self.reservoir[slots[replace]] = values[~fill][replace]
+
+        self.n_rows += n_chunk
+
+    def get_sample(self):
+        return self.reservoir[:min(self.n_rows, len(self.reservoir))]
+
+    def get_skewness(self):
+        """Sample skewness from the accumulated moments (0 for constant columns)"""
+
+        mean = self.power_sums[0] / self.n_rows
+        variance = self.power_sums[1] / self.n_rows - mean ** 2
+        third_moment = self.power_sums[2] / self.n_rows - 3 * mean * self.power_sums[1] / self.n_rows + 2 * mean ** 3
+        with np.errstate(divide='ignore', invalid='ignore'):
+            skewness = third_moment / np.clip(variance, 0, None) ** 1.5
+        return np.nan_to_num(skewness)
+
+    def fit_scaler(self):
+        """Log flags, winsorisation bounds and median / IQR per column"""
+
+        if self.n_rows == 0:
+            raise ValueError("No rows were seen - cannot fit the scaler")
+
+        use_log = (self.minimum >= 0) & (self.get_skewness() > LOG_SKEW_THRESHOLD)
+        sample = transform_values(self.get_sample(), use_log)
+
+        lower, q1, median, q3, upper = np.quantile(
+            sample, [WINSOR_QUANTILES[0], 0.25, 0.5, 0.75, WINSOR_QUANTILES[1]], axis=0)
+        iqr = q3 - q1
+
+        # Columns that are mostly constant fall back to the winsorised range, then to 1
+        scale = np.where(iqr > 0, iqr, np.where(upper > lower, upper - lower, 1.0))
+
+        return {
+            'n_units': int(self.n_rows),
+            'reservoir_size': int(min(self.n_rows, len(self.reservoir))),
+            'columns': [
+                {'name': column, 'log': bool(use_log[i]), 'lower': float(lower[i]), 'upper': float(upper[i]),
+                 'center': float(median[i]), 'scale': float(scale[i])}
+                for i, column in enumerate(self.columns)
+            ],
+        }
+
+def transform_values(values, use_log):
+    """log1p-transform the flagged columns of a float matrix"""
+
+    values = np.array(values, dtype=float)
+    values[:, use_log] = np.log1p(np.clip(values[:, use_log], 0, None))
+    return values
+
+def apply_scaler(values, params):
+    """Transform, winsorise and scale a float matrix with saved scaler parameters"""
+
+    columns = params['columns']
+    use_log = np.array([column['log'] for column in columns])
+    lower = np.array([column['lower'] for column in columns])
+    upper = np.array([column['upper'] for column in columns])
+    center = np.array([column['center'] for column in columns])
+    scale = np.array([column['scale'] for column in columns])
+
+    values = np.clip(transform_values(values, use_log), lower, upper)
+    return ((values - center) / scale).astype(np.float32)
+
+def normalise_simplified_output(csv_file, prefix, output_dir=None, reservoir_size=RESERVOIR_SIZE,
+                                seed=DEFAULT_NORMALISATION_SEED, queue_depth=DEFAULT_QUEUE_DEPTH):
+    """Fit the scaler in one pass over the simplified CSV and write the scaled float32 matrix
+
+    Raw chunk values are spooled to a temporary float32 file during the pass, so the CSV is
+    parsed only once; the final matrix is then written block by block from the spool.
+    """
+
+    csv_file = Path(csv_file)
+    output_dir = Path(output_dir or csv_file.parent)
+    matrix_file, shrid2_file, params_file = get_feature_matrix_files(output_dir, prefix)
+    spool_file = output_dir / f"{prefix}_feature_matrix.spool"
+
+    print(f"Normalising features of {csv_file.name}...")
+    header = add_share_columns(pd.read_csv(csv_file, nrows=0, dtype={'shrid2': str}), prefix)
+    columns = [column for column in header.columns if column != 'shrid2']
+
+    statistics = StreamingStatistics(columns, reservoir_size, seed)
+    shrid2_blocks = []
+    try:
+        with open(spool_file, 'wb') as spool:
+            chunks = pd.read_csv(csv_file, chunksize=CHUNK_SIZE, dtype={'shrid2': str})
+            for chunk in PrefetchingReader(chunks, queue_depth):
+                chunk = add_share_columns(chunk, prefix)
+                values = chunk[columns].to_numpy(dtype=float)
+                statistics.add_chunk(values)
+                spool.write(values.astype(np.float32).tobytes())
+                shrid2_blocks.append(chunk['shrid2'].to_numpy(dtype=str).astype(bytes))
+
+        params = statistics.fit_scaler()
+        params['prefix'] = prefix
+
+        raw_values = np.memmap(spool_file, dtype=np.float32, mode='r', shape=(statistics.n_rows, len(columns)))
+        matrix = np.lib.format.open_memmap(matrix_file, mode='w+', dtype=np.float32,
+                                           shape=(statistics.n_rows, len(columns)))
+        for start in range(0, statistics.n_rows, CHUNK_SIZE):
+            matrix[start:start + CHUNK_SIZE] = apply_scaler(raw_values[start:start + CHUNK_SIZE], params)
+        matrix.flush()
+        del matrix, raw_values
+    finally:
+        spool_file.unlink(missing_ok=True)
+
+    np.save(shrid2_file, np.concatenate(shrid2_blocks) if shrid2_blocks else np.array([], dtype=bytes))
+    with open(params_file, 'w') as json_file:
+        json.dump(params, json_file, indent=2)
+
+    n_log = sum(column['log'] for column in params['columns'])
+    print(f"Saved {statistics.n_rows:,} x {len(columns)} float32 feature matrix to {matrix_file}")
+    print(f"Saved scaler parameters ({n_log} log-transformed columns) to {params_file}")
+    return matrix_file
+
+def load_feature_matrix(output_dir, prefix):
+    """Memory-map the scaled feature matrix and return it with its shrid2 keys and scaler parameters"""
+
+    matrix_file, shrid2_file, params_file = get_feature_matrix_files(output_dir, prefix)
+    with open(params_file) as json_file:
+        params = json.load(json_file)
+    return np.load(matrix_file, mmap_mode='r'), np.load(shrid2_file, mmap_mode='r'), params
+
+def select_matrix_columns(matrix, params, columns):
+    """Some columns of a loaded feature matrix (read into memory) with their scaler parameters"""
+
+    names = [column['name'] for column in params['columns']]
+    missing = [column for column in columns if column not in names]
+    if missing:
+        raise KeyError(f"Columns not in the {params.get('prefix')} feature matrix: {missing}")
+
+    positions = [names.index(column) for column in columns]
+    return (np.ascontiguousarray(matrix[:, positions]),
+            {**params, 'columns': [params['columns'][position] for position in positions]})
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Fit robust scalers and write float32 feature matrices")
+    parser.add_argument('csv_files', nargs='+', type=Path, help='Simplified CSV files (e.g. ec13_shrid_simplified.csv)')
+    parser.add_argument('--reservoir-size', type=int, default=RESERVOIR_SIZE,
+                        help=f'Rows kept for the quantile estimates (default: {RESERVOIR_SIZE})')
+    parser.add_argument('--seed', type=int, default=DEFAULT_NORMALISATION_SEED, help='Seed for the reservoir sample')
+    return parser.parse_args()
+
+def main():
+    """Normalise the given simplified outputs"""
+    args = parse_args()
+
+    for csv_file in args.csv_files:
+        prefix = csv_file.name.split('_')[0]
+        normalise_simplified_output(csv_file, prefix, reservoir_size=args.reservoir_size, seed=args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Double-buffered chunk pipeline for the cleaning scripts
+A reader thread reads and parses the next chunks into a bounded queue while the main thread
+aggregates the current chunk, and a writer thread appends finished chunks to the output file,
+so end-to-end time approaches max(I/O, compute) instead of their sum
+"""
+
+import queue
+import threading
+
+DEFAULT_QUEUE_DEPTH = 4
+
+# Marks the end of a queue
+_END = object()
+
+class _ThreadError:
+    """Wraps an exception raised inside a pipeline thread so it can be re-raised in the main thread"""
+    def __init__(self, error):
+        self.error = error
+
+def add_pipeline_arguments(parser):
+    """Add the --queue-depth option to a cleaning script's argument parser"""
+    parser.add_argument(
+        '--queue-depth', type=int, default=DEFAULT_QUEUE_DEPTH,
+        help=f'Number of chunks buffered between the reader, main and writer threads (default: {DEFAULT_QUEUE_DEPTH})'
+    )
+
+class PrefetchingReader:
+    """Iterate over chunks that a background thread reads ahead into a bounded queue
+
+    Example:
+        for chunk in PrefetchingReader(pd.read_csv(file_path, chunksize=10000), queue_depth=4):
+            ...
+    """
+
+    def __init__(self, chunks, queue_depth=DEFAULT_QUEUE_DEPTH):
+        if queue_depth < 1:
+            raise ValueError("queue_depth must be at least 1")
+
+        self.chunks = chunks
+        self.queue = queue.Queue(maxsize=queue_depth)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._read, name='chunk-reader', daemon=True)
+
+    def _put(self, item):
+        """Put an item on the queue unless the consumer has stopped"""
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self):
+        try:
+            for chunk in self.chunks:
+                if not self._put(chunk):
+                    return
+        except Exception as error:
+            self._put(_ThreadError(error))
+            return
+        self._put(_END)
+
+    def __iter__(self):
+        self.thread.start()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, _ThreadError):
+                    raise item.error
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop the reader thread (also called when the consumer stops early)"""
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+class ChunkWriter:
+    """Append DataFrame chunks to a CSV file from a background thread
+
+    Example:
+        with ChunkWriter(output_file, queue_depth=4) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+
+    def __init__(self, output_file, queue_depth=DEFAULT_QUEUE_DEPTH):
+        if queue_depth < 1:
+            raise ValueError("queue_depth must be at least 1")
+
+        self.output_file = output_file
+        self.queue = queue.Queue(maxsize=queue_depth)
+        self.error = None
+        self.rows_written = 0
+        self.thread = threading.Thread(target=self._write, name='chunk-writer', daemon=True)
+        self.thread.start()
+
+    def _write(self):
+        # Any failure, including opening the file, stops the thread and is re-raised by write()/close()
+        try:
+            with open(self.output_file, 'w', newline='') as output:
+                header = True
+                while True:
+                    chunk = self.queue.get()
+                    if chunk is _END:
+                        return
+                    chunk.to_csv(output, header=header, index=False)
+                    header = False
+                    self.rows_written += len(chunk)
+        except Exception as error:
+            self.error = error
+
+    def _put(self, item):
+        """Put an item on the queue while the writer thread is alive"""
+        while self.thread.is_alive():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def write(self, chunk):
+        """Queue a chunk for writing (blocks while the queue is full)"""
+        if self.error is None and self._put(chunk):
+            return
+        raise self.error or RuntimeError(f"Writer thread for {self.output_file} stopped unexpectedly")
+
+    def close(self):
+        """Flush the remaining chunks and wait for the writer thread"""
+        self._put(_END)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
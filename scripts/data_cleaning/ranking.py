@@ -0,0 +1,143 @@
+"""
+Top-k / bottom-k rankings of units per state or district over memory-mapped column stores
+Uses partial selection (argpartition) within each geographic group instead of full sorts,
+and caches results for repeated feature/group combinations
+
+Usage:
+    python ranking.py ec13_emp_financial_services --k 100 --level state
+    python ranking.py ec13_formal_employment_ratio --k 50 --level district --bottom
+"""
+
+import argparse
+from collections import OrderedDict
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+from column_store import get_column_store_dir, open_column
+from shrid_utils import extract_geographic_prefix
+
+# Define paths
+CLEANED_FILES_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\processed\cleaned_files")
+
+NATIONAL_LABEL = 'ALL'
+MAX_CACHED_RESULTS = 64
+
+class RankingEngine:
+    """Answer top-k and bottom-k queries for one census year's column store
+
+    Example:
+        engine = RankingEngine(get_column_store_dir(CLEANED_FILES_DIR, 'ec13'))
+        top_banks = engine.top_k('ec13_emp_financial_services', k=100, level='state')
+    """
+
+    def __init__(self, store_dir, max_cached_results=MAX_CACHED_RESULTS):
+        self.store_dir = Path(store_dir)
+        self.max_cached_results = max_cached_results
+        self.shrid2 = open_column(self.store_dir, 'shrid2')
+        self._groupings = {}
+        self._results = OrderedDict()
+
+    def get_grouping(self, level):
+        """Units ordered by geographic group, with the group labels and segment boundaries (cached)"""
+
+        if level not in self._groupings:
+            if level is None:
+                order = np.arange(len(self.shrid2))
+                labels = np.array([NATIONAL_LABEL])
+                boundaries = np.array([0, len(order)])
+            else:
+                groups = extract_geographic_prefix(pd.Series(self.shrid2.astype(str)), level)
+                codes, labels = pd.factorize(groups, sort=True)
+                order = np.argsort(codes, kind='stable')
+                boundaries = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+            self._groupings[level] = (order, np.asarray(labels), boundaries)
+
+        return self._groupings[level]
+
+    def rank(self, feature, k=100, level='state', ascending=False):
+        """k units with the highest (or lowest) feature values in every group at the level
+
+        Results are cached (least recently used dropped first); callers receive a copy.
+        """
+
+        if k < 1:
+            raise ValueError("k must be at least 1")
+
+        cache_key = (feature, k, level, ascending)
+        if cache_key in self._results:
+            self._results.move_to_end(cache_key)
+            return self._results[cache_key].copy()
+
+        order, labels, boundaries = self.get_grouping(level)
+        values = np.asarray(open_column(self.store_dir, feature), dtype=float)[order]
+
+        # Rank on -value for top-k so both directions select the k smallest
+        keys = values if ascending else -values
+        keys = np.where(np.isnan(keys), np.inf, keys)
+
+        # Groups with at most k units keep all of them; only larger groups need a partial selection
+        sizes = np.diff(boundaries)
+        group_codes = np.repeat(np.arange(len(labels)), sizes)
+        candidates = [np.flatnonzero(np.repeat(sizes <= k, sizes))]
+
+        for start, end in zip(boundaries[:-1][sizes > k], boundaries[1:][sizes > k]):
+            candidates.append(start + np.argpartition(keys[start:end], k - 1)[:k])
+
+        candidates = np.concatenate(candidates)
+        candidates = candidates[np.isfinite(keys[candidates])]
+
+        # Sorting only the selected units is cheap: at most k per group
+        candidates = candidates[np.lexsort((keys[candidates], group_codes[candidates]))]
+        selected_groups = group_codes[candidates]
+        group_starts = np.searchsorted(selected_groups, selected_groups, side='left')
+
+        ranking = pd.DataFrame({
+            'group': labels[selected_groups],
+            'rank': np.arange(len(candidates)) - group_starts + 1,
+            'shrid2': self.shrid2[order[candidates]].astype(str),
+            feature: values[candidates],
+        })
+        self._results[cache_key] = ranking
+        while len(self._results) > self.max_cached_results:
+            self._results.popitem(last=False)
+        return ranking.copy()
+
+    def top_k(self, feature, k=100, level='state'):
+        """k units with the highest values per group"""
+        return self.rank(feature, k, level, ascending=False)
+
+    def bottom_k(self, feature, k=100, level='state'):
+        """k units with the lowest values per group"""
+        return self.rank(feature, k, level, ascending=True)
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Top-k units per state/district for a feature")
+    parser.add_argument('feature', help='Column to rank on, e.g. ec13_emp_financial_services')
+    parser.add_argument('--k', type=int, default=100, help='Number of units per group (default: 100)')
+    parser.add_argument('--level', choices=['state', 'district', 'subdistrict', 'national'], default='state',
+                        help='Geographic grouping (default: state)')
+    parser.add_argument('--bottom', action='store_true', help='Return the lowest values instead of the highest')
+    parser.add_argument('--output', type=Path, default=None, help='Optional CSV file for the ranking')
+    return parser.parse_args()
+
+def main():
+    """Print (or save) a ranking from the command line"""
+    args = parse_args()
+
+    prefix = args.feature.split('_')[0]
+    engine = RankingEngine(get_column_store_dir(CLEANED_FILES_DIR, prefix))
+    level = None if args.level == 'national' else args.level
+
+    ranking = engine.rank(args.feature, args.k, level, ascending=args.bottom)
+
+    if args.output is not None:
+        ranking.to_csv(args.output, index=False)
+        print(f"Saved {len(ranking):,} ranked units to {args.output}")
+    else:
+        print(ranking.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Locate and open raw SHRUG census files, including compressed downloads
+Reads ecXX_shrid.csv directly from .zip, .gz or .zst archives with streaming decompression,
+so the multi-gigabyte CSVs never have to be extracted to disk. Decompression runs in a
+background thread, overlapping with CSV parsing.
+"""
+
+import gzip
+import io
+import queue
+import threading
+import zipfile
+
+from pathlib import Path
+
+DECOMPRESS_BLOCK_SIZE = 4 * 1024 * 1024
+DECOMPRESS_QUEUE_DEPTH = 8
+
+def get_raw_source_candidates(raw_data_dir, prefix, dataset=None):
+    """Paths where the raw file of one census year (or other SHRUG module) may live, in order of preference
+
+    dataset: name of the SHRUG download when it differs from the file prefix
+    (e.g. 'pc11-pca' for pc11_pca_clean_shrid.csv)
+    """
+
+    raw_data_dir = Path(raw_data_dir)
+    csv_name = f"{prefix}_shrid.csv"
+    dataset = dataset or prefix
+    extracted_dir = raw_data_dir / f"shrug-{dataset}-csv"
+
+    return [
+        extracted_dir / csv_name,
+        extracted_dir / f"{csv_name}.gz",
+        extracted_dir / f"{csv_name}.zst",
+        raw_data_dir / f"shrug-{dataset}-csv.zip",
+        raw_data_dir / f"{csv_name}.gz",
+        raw_data_dir / f"{csv_name}.zst",
+        raw_data_dir / f"{prefix}_shrid.zip",
+    ]
+
+def find_raw_source(raw_data_dir, prefix, dataset=None):
+    """Return the first existing raw file (plain or compressed) for a census year or SHRUG module"""
+
+    candidates = get_raw_source_candidates(raw_data_dir, prefix, dataset)
+    for candidate in candidates:
+        if candidate.exists():
+            return candidate
+
+    tried = '\n  '.join(str(candidate) for candidate in candidates)
+    raise FileNotFoundError(f"No raw {prefix} file found. Tried:\n  {tried}")
+
+def find_zip_member(archive, member_name):
+    """Name of the CSV inside a zip archive (matched by file name, or the only CSV)"""
+
+    names = [name for name in archive.namelist() if not name.endswith('/')]
+    matches = [name for name in names if Path(name).name == member_name]
+    if matches:
+        return matches[0]
+
+    csv_names = [name for name in names if name.endswith('.csv')]
+    if len(csv_names) == 1:
+        return csv_names[0]
+
+    raise FileNotFoundError(f"Could not find {member_name} in {archive.filename}")
+
+def open_decompressed_stream(path, member_name):
+    """Binary stream of the decompressed CSV bytes"""
+
+    name = path.name.lower()
+
+    if name.endswith('.gz'):
+        return gzip.open(path, 'rb')
+
+    if name.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(f"Reading {path.name} requires the zstandard package (conda install zstandard)")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+
+    if name.endswith('.zip'):
+        archive = zipfile.ZipFile(path)
+        return archive.open(find_zip_member(archive, member_name))
+
+    return open(path, 'rb')
+
+class ThreadedDecompressionStream(io.RawIOBase):
+    """Read-only stream whose blocks are decompressed ahead of time in a background thread
+
+    zlib and zstd release the GIL while decompressing, so the parser in the main (or reader)
+    thread can tokenize one block while the next one is being decompressed.
+    """
+
+    def __init__(self, stream, block_size=DECOMPRESS_BLOCK_SIZE, queue_depth=DECOMPRESS_QUEUE_DEPTH):
+        super().__init__()
+        self.stream = stream
+        self.block_size = block_size
+        self.blocks = queue.Queue(maxsize=queue_depth)
+        self.stop_event = threading.Event()
+        self.current = memoryview(b'')
+        self.finished = False
+        self.thread = threading.Thread(target=self._decompress, name='decompressor', daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        while not self.stop_event.is_set():
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decompress(self):
+        try:
+            while True:
+                block = self.stream.read(self.block_size)
+                if not self._put(block) or not block:
+                    return
+        except Exception as error:
+            self._put(error)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.current:
+            if self.finished:
+                return 0
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self.finished = True
+                return 0
+            self.current = memoryview(block)
+
+        n_bytes = min(len(buffer), len(self.current))
+        buffer[:n_bytes] = self.current[:n_bytes]
+        self.current = self.current[n_bytes:]
+        return n_bytes
+
+    def close(self):
+        if not self.closed:
+            self.stop_event.set()
+            self.thread.join()
+            self.stream.close()
+        super().close()
+
+def open_raw_source(path, member_name=None, threaded=True):
+    """Open a raw census file for pd.read_csv, decompressing on the fly if needed
+
+    Plain CSVs are opened directly; compressed sources are decompressed in a background
+    thread when threaded=True.
+    """
+
+    path = Path(path)
+    member_name = member_name or path.name.split('.')[0] + '.csv'
+    stream = open_decompressed_stream(path, member_name)
+
+    if not threaded or path.suffix.lower() == '.csv':
+        return stream
+
+    return io.BufferedReader(ThreadedDecompressionStream(stream), buffer_size=DECOMPRESS_BLOCK_SIZE)
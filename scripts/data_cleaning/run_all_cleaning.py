@@ -3,18 +3,28 @@ Master script to run all Economic Census data cleaning in sequence
 Cleans EC98, EC05, and EC13 data files for market segmentation analysis
 """
 
+import argparse
+
 import pandas as pd
 import subprocess
 import sys
 from pathlib import Path
 import time
 
+from bootstrap import DEFAULT_REPLICATES, bootstrap_statistics
+from pipeline import DEFAULT_QUEUE_DEPTH, add_pipeline_arguments
+from sampling import add_sample_arguments
+from shrug_merge import merge_all_years
+from visualization_aggregates import combine_year_totals
+
 # Define paths
 SCRIPTS_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\scripts\data_cleaning")
 CLEANED_FILES_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\processed\cleaned_files")
+VISUALIZATION_DATA_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\visualizations\aggregates")
+SAMPLED_FILES_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\processed\sampled_files")
 
-def run_script(script_name):
-    """Run a cleaning script and capture results"""
+def run_script(script_name, script_args=()):
+    """Run a cleaning script (with optional command line arguments) and capture results"""
     print(f"\n{'='*80}")
     print(f"STARTING: {script_name}")
     print(f"{'='*80}")
@@ -24,7 +34,7 @@ def run_script(script_name):
     try:
         # Run the script
         result = subprocess.run(
-            [sys.executable, script_name], 
+            [sys.executable, script_name, *script_args], 
             cwd=SCRIPTS_DIR,
             capture_output=True, 
             text=True, 
@@ -50,7 +60,7 @@ def run_script(script_name):
         print(f"STDERR: {e.stderr}")
         return False
 
-def check_output_files():
+def check_output_files(output_dir=CLEANED_FILES_DIR):
     """Check that all expected output files were created"""
     print(f"\n{'='*80}")
     print("CHECKING OUTPUT FILES")
@@ -60,19 +70,25 @@ def check_output_files():
         "ec98_shrid_simplified.csv",
         "ec98_shrid_summary_stats.csv", 
         "ec98_shrid_column_documentation.csv",
+        "ec98_feature_matrix.npy",
+        "ec98_scaler.json",
         "ec05_shrid_simplified.csv",
         "ec05_shrid_summary_stats.csv",
         "ec05_shrid_column_documentation.csv", 
+        "ec05_feature_matrix.npy",
+        "ec05_scaler.json",
         "ec13_shrid_simplified.csv",
         "ec13_shrid_summary_stats.csv",
-        "ec13_shrid_column_documentation.csv"
+        "ec13_shrid_column_documentation.csv",
+        "ec13_feature_matrix.npy",
+        "ec13_scaler.json"
     ]
     
     all_files_exist = True
     file_info = []
     
     for filename in expected_files:
-        filepath = CLEANED_FILES_DIR / filename
+        filepath = output_dir / filename
         if filepath.exists():
             size_mb = filepath.stat().st_size / (1024 * 1024)
             file_info.append({
@@ -92,13 +108,13 @@ def check_output_files():
     
     # Save file inventory
     file_df = pd.DataFrame(file_info)
-    inventory_file = CLEANED_FILES_DIR / "cleaning_output_inventory.csv"
+    inventory_file = output_dir / "cleaning_output_inventory.csv"
     file_df.to_csv(inventory_file, index=False)
     print(f"\n📋 File inventory saved to: {inventory_file}")
     
     return all_files_exist
 
-def generate_summary_report():
+def generate_summary_report(output_dir=CLEANED_FILES_DIR, visualization_dir=VISUALIZATION_DATA_DIR):
     """Generate a summary report of all cleaned data"""
     print(f"\n{'='*80}")
     print("GENERATING SUMMARY REPORT")
@@ -106,9 +122,9 @@ def generate_summary_report():
     
     try:
         # Load all simplified datasets for summary
-        ec98_file = CLEANED_FILES_DIR / "ec98_shrid_simplified.csv"
-        ec05_file = CLEANED_FILES_DIR / "ec05_shrid_simplified.csv" 
-        ec13_file = CLEANED_FILES_DIR / "ec13_shrid_simplified.csv"
+        ec98_file = output_dir / "ec98_shrid_simplified.csv"
+        ec05_file = output_dir / "ec05_shrid_simplified.csv" 
+        ec13_file = output_dir / "ec13_shrid_simplified.csv"
         
         summary_data = []
         
@@ -150,21 +166,83 @@ def generate_summary_report():
         
         # Create summary dataframe
         summary_df = pd.DataFrame(summary_data)
-        summary_file = CLEANED_FILES_DIR / "economic_census_summary.csv"
+        summary_file = output_dir / "economic_census_summary.csv"
         summary_df.to_csv(summary_file, index=False)
         
         print("📊 ECONOMIC CENSUS DATA SUMMARY:")
         print(summary_df.to_string(index=False))
         print(f"\n📋 Summary report saved to: {summary_file}")
         
+        # Combine per-year totals for the visualization dashboards
+        combine_year_totals(visualization_dir)
+        
         return True
         
     except Exception as e:
         print(f"❌ Error generating summary report: {e}")
         return False
 
+def bootstrap_summary_intervals(output_dir=CLEANED_FILES_DIR, bootstrap_replicates=DEFAULT_REPLICATES):
+    """Bootstrap confidence intervals for the summary statistics of every cleaned year"""
+    print(f"\n{'='*80}")
+    print("BOOTSTRAPPING CONFIDENCE INTERVALS")
+    print(f"{'='*80}")
+    
+    intervals = []
+    all_ok = True
+    for prefix in ['ec98', 'ec05', 'ec13']:
+        csv_file = output_dir / f"{prefix}_shrid_simplified.csv"
+        if not csv_file.exists():
+            continue
+        
+        # One failing year (e.g. a degenerate state) does not drop the intervals of the others
+        try:
+            df_simplified = pd.read_csv(csv_file, dtype={'shrid2': str})
+            intervals.append(bootstrap_statistics(df_simplified, prefix, bootstrap_replicates))
+        except Exception as e:
+            print(f"❌ Error bootstrapping {prefix}: {e}")
+            all_ok = False
+    
+    if not intervals:
+        return False
+    
+    try:
+        intervals_file = output_dir / "economic_census_summary_ci.csv"
+        pd.concat(intervals, ignore_index=True).to_csv(intervals_file, index=False)
+        print(f"📋 Bootstrap confidence intervals saved to: {intervals_file}")
+        return all_ok
+        
+    except Exception as e:
+        print(f"❌ Error saving confidence intervals: {e}")
+        return False
+
+def join_shrug_modules(output_dir=CLEANED_FILES_DIR, queue_depth=DEFAULT_QUEUE_DEPTH):
+    """Join population and area modules from data/raw for per-capita and per-area features"""
+    print(f"\n{'='*80}")
+    print("JOINING SHRUG MODULES")
+    print(f"{'='*80}")
+    
+    try:
+        merge_all_years(output_dir=output_dir, queue_depth=queue_depth)
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error joining SHRUG modules: {e}")
+        return False
+
+def parse_args():
+    """Parse command line options (sampling and pipeline options are passed through to every cleaning script)"""
+    parser = argparse.ArgumentParser(description="Run all Economic Census cleaning scripts")
+    add_sample_arguments(parser)
+    add_pipeline_arguments(parser)
+    parser.add_argument('--bootstrap-replicates', type=int, default=DEFAULT_REPLICATES,
+                        help=f'Bootstrap replicates for the summary confidence intervals, 0 to skip (default: {DEFAULT_REPLICATES})')
+    return parser.parse_args()
+
 def main():
     """Main function to run all cleaning scripts"""
+    args = parse_args()
+    
     print("🚀 STARTING ECONOMIC CENSUS DATA CLEANING PIPELINE")
     print("="*80)
     print("This script will clean EC98, EC05, and EC13 datasets")
@@ -173,6 +251,18 @@ def main():
     print("Market segmentation indicators will be calculated")
     print("="*80)
     
+    # Sample runs pass the same seed and reference unit count to every year so that the same units are selected
+    script_args = ['--queue-depth', str(args.queue_depth)]
+    output_dir = CLEANED_FILES_DIR
+    visualization_dir = VISUALIZATION_DATA_DIR
+    if args.sample is not None:
+        script_args += ['--sample', repr(args.sample), '--sample-seed', str(args.sample_seed),
+                        '--sample-reference-units', str(args.sample_reference_units)]
+        output_dir = SAMPLED_FILES_DIR
+        visualization_dir = SAMPLED_FILES_DIR / "visualization_aggregates"
+        print(f"SAMPLE MODE: --sample {args.sample:g} --sample-seed {args.sample_seed}")
+        print(f"Outputs will be written to {output_dir}")
+    
     start_time = time.time()
     
     # Scripts to run in order
@@ -186,7 +276,7 @@ def main():
     
     # Run each cleaning script
     for script in cleaning_scripts:
-        if run_script(script):
+        if run_script(script, script_args):
             success_count += 1
         else:
             print(f"\n⚠️ Script {script} failed - continuing with others...")
@@ -196,8 +286,11 @@ def main():
     print(f"PIPELINE RESULTS: {success_count}/{len(cleaning_scripts)} scripts completed successfully")
     print(f"{'='*80}")
     
-    files_ok = check_output_files()
-    report_ok = generate_summary_report()
+    files_ok = check_output_files(output_dir)
+    report_ok = generate_summary_report(output_dir, visualization_dir)
+    intervals_ok = (bootstrap_summary_intervals(output_dir, args.bootstrap_replicates)
+                    if args.bootstrap_replicates > 0 else None)
+    modules_ok = join_shrug_modules(output_dir, args.queue_depth)
     
     end_time = time.time()
     total_duration = end_time - start_time
@@ -210,14 +303,18 @@ def main():
     print(f"✅ Scripts completed: {success_count}/{len(cleaning_scripts)}")
     print(f"📁 Files created: {'✅ All files OK' if files_ok else '⚠️ Some files missing'}")
     print(f"📊 Summary report: {'✅ Generated' if report_ok else '❌ Failed'}")
+    if intervals_ok is not None:
+        print(f"📏 Confidence intervals: {'✅ Generated' if intervals_ok else '❌ Failed'}")
+    print(f"🔗 SHRUG module join: {'✅ Done' if modules_ok else '❌ Failed'}")
     
     if success_count == len(cleaning_scripts) and files_ok:
         print("\n🎉 SUCCESS: All Economic Census data cleaned and ready for analysis!")
-        print(f"📂 Output location: {CLEANED_FILES_DIR}")
+        print(f"📂 Output location: {output_dir}")
         print("\n📋 Next steps:")
         print("1. Review summary statistics in *_summary_stats.csv files")
         print("2. Check column documentation in *_column_documentation.csv files") 
-        print("3. Proceed to Phase 2A: Feature Engineering")
+        print(f"3. Plot-ready aggregates are in {visualization_dir}")
+        print("4. Proceed to Phase 2A: Feature Engineering")
     else:
         print("\n⚠️ WARNING: Some issues occurred during cleaning")
         print("Please check the error messages above and retry failed scripts")
@@ -0,0 +1,154 @@
+"""
+Reproducible hash sampling of shrid2 units for fast development runs
+A unit is kept when a seeded hash of its shrid2 falls below the sample fraction, so the same units
+are chosen in EC98, EC05 and EC13. Each unit is an independent draw, so per-state rates vary
+around the fraction (the sample is not stratified); states with no sampled unit are topped up
+"""
+
+import argparse
+
+import pandas as pd
+import numpy as np
+
+from shrid_utils import extract_state_id
+
+DEFAULT_SAMPLE_SEED = 42
+
+# --sample N is converted with this reference unit count (about one census year, EC05 has 517,389
+# units) in every script, so all years use the same fraction without counting the raw files first
+SAMPLE_REFERENCE_UNITS = 517389
+
+# States with no unit below the fraction keep their units below this multiple of it
+TOPUP_MULTIPLIER = 10
+
+def parse_sample_arg(value):
+    """Parse --sample as a fraction (0 < x < 1) or a fixed number of units (x >= 1)"""
+
+    try:
+        sample = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"--sample must be a number, got '{value}'")
+
+    if sample <= 0:
+        raise argparse.ArgumentTypeError("--sample must be positive")
+    if sample >= 1 and not sample.is_integer():
+        raise argparse.ArgumentTypeError("--sample must be a fraction below 1 or a whole number of units")
+
+    return sample
+
+def add_sample_arguments(parser):
+    """Add the --sample, --sample-seed and --sample-reference-units options to a script's argument parser"""
+
+    parser.add_argument(
+        '--sample', type=parse_sample_arg, default=None,
+        help='Clean a sample of units: a fraction (e.g. 0.05) or an approximate number of units (e.g. 20000)'
+    )
+    parser.add_argument(
+        '--sample-seed', type=int, default=DEFAULT_SAMPLE_SEED,
+        help=f'Seed for the sample (default: {DEFAULT_SAMPLE_SEED})'
+    )
+    parser.add_argument(
+        '--sample-reference-units', type=int, default=SAMPLE_REFERENCE_UNITS,
+        help=f'Unit count that --sample N is a fraction of; use the same value for every year '
+             f'(default: {SAMPLE_REFERENCE_UNITS:,})'
+    )
+
+def sample_size_to_fraction(size, n_units):
+    """Fraction of units that gives a sample of about `size` units (always below 1)"""
+    return min(size / max(n_units, 1), float(np.nextafter(1.0, 0.0)))
+
+def create_sampler(args):
+    """Return a HashSampler for the parsed arguments, or None for a full run"""
+
+    if args.sample is None:
+        return None
+    return HashSampler(args.sample, seed=args.sample_seed, reference_units=args.sample_reference_units)
+
+def get_unit_hashes(shrid2, seed=DEFAULT_SAMPLE_SEED):
+    """Map shrid2 identifiers to deterministic pseudo-random numbers in [0, 1)"""
+
+    if seed < 0:
+        raise ValueError("Sample seed must be non-negative")
+
+    # hash_pandas_object needs a 16 character key; it is stable across runs and platforms
+    hash_key = f"{seed:016d}"[-16:]
+    hashes = pd.util.hash_pandas_object(shrid2.astype(str), index=False, hash_key=hash_key)
+
+    return hashes.to_numpy() / 2.0**64
+
+class HashSampler:
+    """Draw a seeded hash sample of units while chunks stream in
+
+    A unit is kept when its hash is below the sample fraction, so membership depends only on
+    (shrid2, seed) and a unit present in several census years is sampled in all or none of them.
+    A fixed size (--sample N) is the fraction N / reference_units, which does not depend on the file.
+
+    A state with no unit below the fraction is topped up with its units whose hash is below
+    TOPUP_MULTIPLIER x the fraction, a test that again only depends on (shrid2, seed).
+    """
+
+    def __init__(self, sample, seed=DEFAULT_SAMPLE_SEED, reference_units=SAMPLE_REFERENCE_UNITS):
+        if reference_units <= 0:
+            raise ValueError("The sample reference unit count must be positive")
+
+        self.size = int(sample) if sample >= 1 else None
+        self.fraction = sample_size_to_fraction(sample, reference_units) if sample >= 1 else sample
+        self.topup_fraction = min(1.0, TOPUP_MULTIPLIER * self.fraction)
+        self.reference_units = reference_units
+        self.seed = seed
+
+        self.state_counts = pd.Series(dtype='int64')
+        self.selected = []
+        self.sampled_states = set()
+        self.topup_candidates = None
+
+    def describe(self):
+        """Human readable description of the sample"""
+        if self.size is None:
+            return f"{self.fraction:.2%} of units by shrid2 hash (seed {self.seed})"
+        return (f"~{self.size:,} units: {self.fraction:.3%} of {self.reference_units:,} reference units "
+                f"by shrid2 hash (seed {self.seed})")
+
+    def add_chunk(self, chunk):
+        """Count units per state and keep the sampled and top-up candidate rows of one chunk"""
+
+        states = extract_state_id(chunk['shrid2'])
+        self.state_counts = self.state_counts.add(states.value_counts(), fill_value=0)
+
+        hashes = get_unit_hashes(chunk['shrid2'], self.seed)
+        states = states.to_numpy()
+
+        def take(mask):
+            # Helper columns are only added to a consolidated copy of the kept rows, not to the wide raw chunk
+            return chunk[mask].copy().assign(_sample_state=states[mask], _sample_hash=hashes[mask])
+
+        selected = take(hashes < self.fraction)
+        self.selected.append(selected)
+        self.sampled_states.update(selected['_sample_state'].unique())
+
+        # Top-up candidates are only kept for states that have no sampled unit so far
+        candidates = take((hashes >= self.fraction) & (hashes < self.topup_fraction))
+        if self.topup_candidates is not None:
+            candidates = pd.concat([self.topup_candidates, candidates])
+        self.topup_candidates = candidates[~candidates['_sample_state'].isin(self.sampled_states)]
+
+    def finalize(self):
+        """Return the sampled rows (hash below the fraction, plus top-ups for empty states)"""
+
+        selected = pd.concat(self.selected, ignore_index=True)
+        total_units = int(self.state_counts.sum())
+
+        if self.topup_candidates is not None and len(self.topup_candidates):
+            print(f"Topped up {self.topup_candidates['_sample_state'].nunique()} states with no sampled unit "
+                  f"({len(self.topup_candidates):,} units with hash below {self.topup_fraction:.6g})")
+            selected = pd.concat([selected, self.topup_candidates], ignore_index=True)
+
+        n_states = selected['_sample_state'].nunique()
+        if n_states < len(self.state_counts):
+            print(f"⚠️ {len(self.state_counts) - n_states} small states have no sampled unit")
+
+        rates = selected['_sample_state'].value_counts() / self.state_counts
+        print(f"Sampled {len(selected):,} of {total_units:,} units across {n_states} of {len(self.state_counts)} "
+              f"states: {self.describe()} (per-state rates {rates.min():.2%} - {rates.max():.2%})")
+
+        return selected.drop(columns=['_sample_state', '_sample_hash']).reset_index(drop=True)
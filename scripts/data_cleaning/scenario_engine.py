@@ -0,0 +1,179 @@
+"""
+What-if scenarios for the India 1 / 2 / 3 tier split
+Reads the scaled features of every census year once from the persisted feature matrices
+(ecXX_feature_matrix.npy, written by the cleaning scripts); each scenario is then a
+single matrix-vector product plus partial selection of the tier thresholds, reported as tier
+transitions against the baseline weights
+
+Usage:
+    python scenario_engine.py --weight formal_employment_ratio=2 --weight entertainment_culture_share=0
+"""
+
+import argparse
+import time
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+from census_dataset import CensusDataset
+from feature_matrix import FEATURE_NAMES, get_feature_name
+from normalisation import load_feature_matrix, select_matrix_columns
+
+# Define paths
+CLEANED_FILES_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\processed\cleaned_files")
+
+# Tier sizes from the top: India 1 = top 5%, India 2 = next 25%, India 3 = remaining 70%
+TIERS = ['India 1', 'India 2', 'India 3']
+TIER_SHARES = [0.05, 0.25, 0.70]
+
+# Baseline score weights on scaled features (features not listed get a weight of 0)
+BASELINE_WEIGHTS = {
+    'service_sophistication_score': 1.0,
+    'financial_services_share': 1.0,
+    'formal_employment_ratio': 1.0,
+    'economic_diversity_score': 1.0,
+    'retail_diversity': 1.0,
+    'communication_digital_share': 1.0,
+    'business_services_share': 0.5,
+    'entertainment_culture_share': 0.5,
+    'non_farm_employment_ratio': 0.5,
+    'firm_density': 0.5,
+    'primary_industries_share': -1.0,
+}
+
+def assign_tiers(scores, tier_shares=TIER_SHARES):
+    """Tier number (0 = India 1) per unit by score rank, using partial selection instead of a sort"""
+
+    n_units = len(scores)
+    tiers = np.full(n_units, len(tier_shares) - 1, dtype=np.int8)
+    if n_units == 0:
+        return tiers
+
+    # Number of units above each tier boundary
+    cutoffs = np.round(np.cumsum(tier_shares[:-1]) * n_units).astype(int).clip(1, n_units)
+    order = np.argpartition(-scores, cutoffs - 1)
+
+    start = 0
+    for tier, cutoff in enumerate(cutoffs):
+        tiers[order[start:cutoff]] = tier
+        start = cutoff
+
+    return tiers
+
+def count_transitions(baseline_tiers, scenario_tiers):
+    """Baseline tier x scenario tier unit counts"""
+
+    n_tiers = len(TIERS)
+    counts = np.bincount(baseline_tiers.astype(int) * n_tiers + scenario_tiers, minlength=n_tiers ** 2)
+    return pd.DataFrame(counts.reshape(n_tiers, n_tiers),
+                        index=pd.Index(TIERS, name='baseline'), columns=pd.Index(TIERS, name='scenario'))
+
+class ScenarioEngine:
+    """Re-score and re-tier all units for new feature weights
+
+    Example:
+        engine = ScenarioEngine(CensusDataset(CLEANED_FILES_DIR))
+        result = engine.run({'formal_employment_ratio': 2.0, 'entertainment_culture_share': 0.0})
+        result['ec13']['transitions']
+    """
+
+    def __init__(self, dataset, years=None, baseline_weights=BASELINE_WEIGHTS):
+        self.years = years or dataset.years
+        self.matrices = {}
+        self.shrid2 = {}
+
+        # Memory-map each year's persisted feature matrix; only features present in every year are scored
+        loaded = {year: load_feature_matrix(dataset.cleaned_dir, year) for year in self.years}
+        available = [{get_feature_name(column['name'], year) for column in params['columns']}
+                     for year, (_, _, params) in loaded.items()]
+        self.feature_names = [name for name in FEATURE_NAMES if all(name in names for names in available)]
+
+        for year, (matrix, shrid2, params) in loaded.items():
+            columns = [f'{year}_{name}' for name in self.feature_names]
+            self.matrices[year], _ = select_matrix_columns(matrix, params, columns)
+            self.shrid2[year] = np.asarray(shrid2).astype(str)
+
+        self.baseline_weights = self.get_weight_vector(baseline_weights)
+        self.baseline_tiers = {year: assign_tiers(self.score(year, self.baseline_weights))
+                               for year in self.years}
+
+    def get_weight_vector(self, weights, base=None):
+        """Weight vector over the feature matrix columns from a dict of feature -> weight
+
+        With base given, only the listed features change (e.g. {'formal_employment_ratio': 2.0}
+        on top of the baseline); a weight of 0 drops a feature.
+        """
+
+        unknown = [feature for feature in weights if feature not in self.feature_names]
+        if unknown:
+            raise KeyError(f"Unknown features {unknown}; available: {self.feature_names}")
+
+        vector = np.zeros(len(self.feature_names), dtype=np.float32) if base is None else base.copy()
+        for feature, weight in weights.items():
+            vector[self.feature_names.index(feature)] = weight
+        return vector
+
+    def score(self, year, weight_vector):
+        """Score of every unit in one year"""
+        return self.matrices[year] @ weight_vector
+
+    def run(self, weights, years=None):
+        """Tiers and baseline transitions for one scenario
+
+        weights: dict of feature -> weight applied on top of the baseline weights
+        Returns a dict per year with 'tiers' (0 = India 1), 'transitions' and 'changed' (units
+        whose tier moved).
+        """
+
+        weight_vector = self.get_weight_vector(weights, base=self.baseline_weights)
+
+        results = {}
+        for year in years or self.years:
+            tiers = assign_tiers(self.score(year, weight_vector))
+            results[year] = {
+                'tiers': tiers,
+                'transitions': count_transitions(self.baseline_tiers[year], tiers),
+                'changed': int((tiers != self.baseline_tiers[year]).sum()),
+            }
+        return results
+
+    def tiers_frame(self, year, tiers):
+        """Tier labels per shrid2"""
+        return pd.DataFrame({'shrid2': self.shrid2[year], 'tier': np.asarray(TIERS)[tiers]})
+
+def parse_weight(value):
+    """Parse FEATURE=WEIGHT"""
+    try:
+        feature, weight = value.rsplit('=', 1)
+        return feature, float(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected FEATURE=WEIGHT, got '{value}'")
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Show how the India 1/2/3 split changes for new feature weights")
+    parser.add_argument('--weight', type=parse_weight, action='append', default=[],
+                        help='Weight override on top of the baseline, e.g. formal_employment_ratio=2 (repeatable)')
+    parser.add_argument('--years', nargs='+', choices=['ec98', 'ec05', 'ec13'], default=None,
+                        help='Census years to include (default: all available)')
+    return parser.parse_args()
+
+def main():
+    """Run one scenario and print the tier transitions per census year"""
+    args = parse_args()
+
+    print("Precomputing feature matrices...")
+    engine = ScenarioEngine(CensusDataset(CLEANED_FILES_DIR), years=args.years)
+
+    start = time.time()
+    results = engine.run(dict(args.weight))
+    elapsed = time.time() - start
+
+    for year, result in results.items():
+        print(f"\n{year.upper()}: {result['changed']:,} units change tier")
+        print(result['transitions'].to_string())
+    print(f"\nScenario evaluated in {elapsed:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Which SHRIC industries are found together: covariance, correlation and co-presence of SHRIC
+employment across units, accumulated while the raw census streams through the cleaning pass
+Each chunk's mean and centred cross-products (X^T X after centring) are computed in worker threads
+and merged into partial accumulators, which are combined at the end (pairwise update of Chan et al.),
+so the full raw frame is never held in memory
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+from shric_store import SHRIC_CODES, get_shric_matrix
+
+DEFAULT_ACCUMULATORS = min(4, os.cpu_count() or 1)
+
+def get_colocation_files(output_dir, prefix):
+    """Covariance, correlation and co-presence CSV files of one census year"""
+    output_dir = Path(output_dir)
+    return {name: output_dir / f"{prefix}_shric_{name}.csv" for name in ['covariance', 'correlation', 'copresence']}
+
+class ShricMoments:
+    """Unit count, mean, centred cross-products and co-presence counts of SHRIC employment"""
+
+    def __init__(self, n_codes=len(SHRIC_CODES)):
+        self.n_units = 0
+        self.mean = np.zeros(n_codes)
+        self.comoments = np.zeros((n_codes, n_codes))
+        self.copresence = np.zeros((n_codes, n_codes), dtype=np.int64)
+
+    @classmethod
+    def from_values(cls, values):
+        """Moments of one block of units (units x codes employment matrix)"""
+
+        moments = cls(values.shape[1])
+        if len(values) == 0:
+            return moments
+
+        values = np.asarray(values, dtype=float)
+        moments.n_units = len(values)
+        moments.mean = values.mean(axis=0)
+        centred = values - moments.mean
+        moments.comoments = centred.T @ centred
+
+        # Co-presence: number of units where both codes have employment
+        present = (values > 0).astype(float)
+        moments.copresence = np.rint(present.T @ present).astype(np.int64)
+        return moments
+
+    def merge(self, other):
+        """Add the moments of another block of units (in place)"""
+
+        if other.n_units == 0:
+            return self
+        if self.n_units == 0:
+            self.n_units = other.n_units
+            self.mean = other.mean.copy()
+            self.comoments = other.comoments.copy()
+            self.copresence = other.copresence.copy()
+            return self
+
+        n_units = self.n_units + other.n_units
+        delta = other.mean - self.mean
+        self.comoments += other.comoments + np.outer(delta, delta) * (self.n_units * other.n_units / n_units)
+        self.mean += delta * (other.n_units / n_units)
+        self.copresence += other.copresence
+        self.n_units = n_units
+        return self
+
+    def covariance(self):
+        """Sample covariance matrix"""
+        return self.comoments / max(self.n_units - 1, 1)
+
+    def correlation(self):
+        """Pearson correlation matrix (NaN for codes without variation)"""
+
+        std = np.sqrt(np.diag(self.comoments))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = self.comoments / np.outer(std, std)
+        correlation[np.outer(std, std) == 0] = np.nan
+        return correlation
+
+    def to_frames(self):
+        """Covariance, correlation and co-presence matrices labelled by SHRIC code"""
+
+        labels = pd.Index([f'shric_{code}' for code in SHRIC_CODES], name='shric')
+        return {
+            'covariance': pd.DataFrame(self.covariance(), index=labels, columns=labels),
+            'correlation': pd.DataFrame(self.correlation(), index=labels, columns=labels),
+            'copresence': pd.DataFrame(self.copresence, index=labels, columns=labels),
+        }
+
+    def save(self, output_dir, prefix):
+        """Write the three matrices as CSV files"""
+
+        files = get_colocation_files(output_dir, prefix)
+        for name, frame in self.to_frames().items():
+            frame.to_csv(files[name])
+        print(f"Saved SHRIC covariance, correlation and co-presence matrices ({self.n_units:,} units) to {files['correlation'].parent}")
+        return files
+
+class ShricColocationAccumulator:
+    """Accumulate SHRIC moments chunk by chunk in worker threads
+
+    Chunk i is merged into partial accumulator i % n_accumulators in submission order, so the
+    result does not depend on thread timing. NumPy releases the GIL in the matrix products, so
+    the workers overlap with parsing and simplification in the main thread.
+
+    Example:
+        colocation = ShricColocationAccumulator('ec13')
+        for chunk in chunks:
+            colocation.add_chunk(chunk)
+        colocation.finalize().save(output_dir, 'ec13')
+    """
+
+    def __init__(self, prefix, n_accumulators=DEFAULT_ACCUMULATORS):
+        self.prefix = prefix
+        self.partials = [ShricMoments() for _ in range(n_accumulators)]
+        self.executor = ThreadPoolExecutor(max_workers=n_accumulators, thread_name_prefix='shric-moments')
+        self.pending = []
+        self.n_chunks = 0
+
+    def _merge_oldest(self):
+        slot, future = self.pending.pop(0)
+        self.partials[slot].merge(future.result())
+
+    def add_chunk(self, chunk):
+        """Queue one raw chunk for accumulation"""
+
+        values = get_shric_matrix(chunk, self.prefix)
+        slot = self.n_chunks % len(self.partials)
+        self.pending.append((slot, self.executor.submit(ShricMoments.from_values, values)))
+        self.n_chunks += 1
+
+        # Bound memory: at most two chunks per worker wait to be merged
+        while len(self.pending) > 2 * len(self.partials):
+            self._merge_oldest()
+
+    def finalize(self):
+        """Wait for the workers and merge the partial accumulators"""
+
+        try:
+            while self.pending:
+                self._merge_oldest()
+        finally:
+            self.executor.shutdown()
+
+        moments = ShricMoments()
+        for partial in self.partials:
+            moments.merge(partial)
+        return moments
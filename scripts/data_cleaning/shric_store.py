@@ -0,0 +1,165 @@
+"""
+Sparse store of the raw SHRIC employment columns (units x 90 SHRIC codes)
+Keeps the full industry detail that is grouped away during cleaning, and answers
+ad-hoc SHRIC bundle queries with sparse matrix products
+"""
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from scipy import sparse
+
+SHRIC_CODES = np.arange(1, 91)
+
+def get_shric_column_name(prefix, code):
+    """Column name of one SHRIC employment code in the raw census file"""
+    return f'{prefix}_emp_shric_{code}'
+
+def get_shric_matrix(chunk, prefix, dtype=np.float64):
+    """Dense units x 90 SHRIC employment matrix of a raw chunk (codes missing from the file are zero)
+
+    float64 by default: SHRIC employment is not always whole, and the store must add up to the
+    same group totals that the cleaning scripts compute from the chunk.
+    """
+
+    positions = []
+    columns = []
+    for position, code in enumerate(SHRIC_CODES):
+        column = get_shric_column_name(prefix, code)
+        if column in chunk.columns:
+            positions.append(position)
+            columns.append(column)
+
+    values = np.zeros((len(chunk), len(SHRIC_CODES)), dtype=dtype)
+    values[:, positions] = chunk[columns].fillna(0).to_numpy()
+    return values
+
+class ShricStoreBuilder:
+    """Accumulate SHRIC employment chunk by chunk while the raw file streams in"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.blocks = []
+        self.shrid2_blocks = []
+
+    def add_chunk(self, chunk):
+        """Convert the SHRIC columns of one raw chunk to a sparse block"""
+
+        self.blocks.append(sparse.csr_matrix(get_shric_matrix(chunk, self.prefix)))
+        self.shrid2_blocks.append(chunk['shrid2'].to_numpy(dtype=str).astype(bytes))
+
+    def build(self):
+        """Stack all chunks into a ShricStore"""
+
+        if not self.blocks:
+            matrix = sparse.csr_matrix((0, len(SHRIC_CODES)), dtype=np.float64)
+            return ShricStore(matrix, np.array([], dtype=bytes), self.prefix)
+
+        matrix = sparse.vstack(self.blocks, format='csr')
+        return ShricStore(matrix, np.concatenate(self.shrid2_blocks), self.prefix)
+
+class ShricStore:
+    """Compressed sparse SHRIC employment matrix indexed by shrid2
+
+    Example:
+        store = ShricStore.load(CLEANED_FILES_DIR / "ec13_shric_store.npz")
+        banking = store.aggregate([65, 66])                       # Series indexed by shrid2
+        bundles = store.aggregate_bundles({'it': [73], 'finance': [65, 66, 67]}, shrid2=units)
+    """
+
+    def __init__(self, matrix, shrid2, prefix):
+        self.matrix = matrix.tocsr()
+        self.shrid2 = shrid2
+        self.prefix = prefix
+        self._unit_index = None
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def unit_index(self):
+        """pandas Index of shrid2 values (built on first use)"""
+        if self._unit_index is None:
+            self._unit_index = pd.Index(self.shrid2.astype(str))
+        return self._unit_index
+
+    def save(self, path):
+        """Save the store as a single compressed .npz file"""
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path,
+            data=self.matrix.data,
+            indices=self.matrix.indices,
+            indptr=self.matrix.indptr,
+            shape=np.array(self.matrix.shape),
+            shrid2=self.shrid2,
+            prefix=np.array(self.prefix),
+        )
+        print(f"Saved sparse SHRIC store ({len(self):,} units, {self.matrix.nnz:,} non-zero cells) to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Load a store saved with ShricStore.save"""
+
+        with np.load(path) as store_file:
+            matrix = sparse.csr_matrix(
+                (store_file['data'], store_file['indices'], store_file['indptr']),
+                shape=tuple(store_file['shape'])
+            )
+            return cls(matrix, store_file['shrid2'], str(store_file['prefix']))
+
+    def get_row_positions(self, shrid2=None):
+        """Row positions for a list of shrid2 values, a boolean mask, or None for all units"""
+
+        if shrid2 is None:
+            return None
+
+        shrid2 = np.asarray(shrid2)
+        if shrid2.dtype == bool:
+            return np.flatnonzero(shrid2)
+
+        positions = self.unit_index.get_indexer(shrid2.astype(str))
+        if (positions < 0).any():
+            raise KeyError(f"{(positions < 0).sum()} shrid2 values are not in the {self.prefix} SHRIC store")
+        return positions
+
+    def get_code_weights(self, bundles):
+        """Indicator matrix (90 x n_bundles) mapping SHRIC codes to each bundle"""
+
+        weights = np.zeros((len(SHRIC_CODES), len(bundles)))
+        for bundle_position, codes in enumerate(bundles.values()):
+            code_positions = np.asarray(codes, dtype=int) - SHRIC_CODES[0]
+            if ((code_positions < 0) | (code_positions >= len(SHRIC_CODES))).any():
+                raise ValueError(f"SHRIC codes must be between {SHRIC_CODES[0]} and {SHRIC_CODES[-1]}")
+            weights[code_positions, bundle_position] = 1
+        return weights
+
+    def aggregate_bundles(self, bundles, shrid2=None):
+        """Employment per unit for each named bundle of SHRIC codes
+
+        bundles: dict of bundle name -> list of SHRIC codes (e.g. define_industry_groups())
+        shrid2: optional list of units (or boolean mask); defaults to every unit
+        """
+
+        positions = self.get_row_positions(shrid2)
+        matrix = self.matrix if positions is None else self.matrix[positions]
+        index = self.unit_index if positions is None else self.unit_index[positions]
+
+        totals = matrix @ self.get_code_weights(bundles)
+        return pd.DataFrame(np.asarray(totals), index=index, columns=list(bundles))
+
+    def aggregate(self, codes, shrid2=None):
+        """Employment per unit summed over one ad-hoc set of SHRIC codes"""
+        return self.aggregate_bundles({'employment': codes}, shrid2)['employment']
+
+    def total(self, codes, shrid2=None):
+        """Total employment over a set of SHRIC codes and units"""
+
+        positions = self.get_row_positions(shrid2)
+        matrix = self.matrix if positions is None else self.matrix[positions]
+        column_totals = np.asarray(matrix.sum(axis=0, dtype=np.float64)).ravel()
+
+        return float(column_totals[np.asarray(codes, dtype=int) - SHRIC_CODES[0]].sum())
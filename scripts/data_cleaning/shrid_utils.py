@@ -0,0 +1,43 @@
+"""
+Helper functions for working with SHRUG shrid2 identifiers
+shrid2 values look like 11-SS-DDD-TTTTT-VVVVVV (census vintage, state, district, subdistrict, town/village)
+"""
+
+import pandas as pd
+import numpy as np
+
+# Economic Census prefixes used in output file and column names, with their census year
+CENSUS_YEARS = {
+    'ec98': 1998,
+    'ec05': 2005,
+    'ec13': 2013,
+}
+
+# Number of dash-separated parts that make up each geographic prefix of shrid2
+GEOGRAPHIC_LEVELS = {
+    'state': 2,
+    'district': 3,
+    'subdistrict': 4,
+}
+
+def extract_geographic_prefix(shrid2, level='state'):
+    """Return the state/district/subdistrict part of a Series of shrid2 identifiers"""
+
+    if level not in GEOGRAPHIC_LEVELS:
+        raise ValueError(f"Unknown geographic level '{level}', expected one of {list(GEOGRAPHIC_LEVELS)}")
+
+    # A plain list comprehension is several times faster than the .str.split accessor here
+    n_parts = GEOGRAPHIC_LEVELS[level]
+    prefixes = ['-'.join(value.split('-', n_parts)[1:n_parts]) for value in shrid2.astype(str).to_numpy(dtype=object)]
+    return pd.Series(prefixes, index=shrid2.index)
+
+def extract_state_id(shrid2):
+    """Return the 2-digit state code for a Series of shrid2 identifiers"""
+    return extract_geographic_prefix(shrid2, level='state')
+
+def encode_shrid2(shrid2):
+    """Encode shrid2 identifiers as int64 keys by dropping the dashes (11-SS-DDD-TTTTT-VVVVVV fits in 18 digits)
+
+    Keys sort in the same order as the identifiers, so sorted key arrays can be merge-joined.
+    """
+    return pd.Series(shrid2).astype(str).str.replace('-', '', regex=False).astype(np.int64).to_numpy()
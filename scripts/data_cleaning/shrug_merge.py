@@ -0,0 +1,225 @@
+"""
+Join other SHRUG modules (population census, village/town directory areas) onto the simplified
+Economic Census outputs and derive per-capita and per-area employment and firm columns
+Each module is converted once into sorted int64 shrid2 keys plus one .npy file per column.
+The simplified CSV is then streamed chunk by chunk, and every module is joined by binary search
+on its memory-mapped keys, so no 500k-row pandas merges are needed
+
+Usage:
+    python shrug_merge.py                      # all census years with the default modules
+    python shrug_merge.py --years ec13 --rebuild
+"""
+
+import argparse
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+from pipeline import DEFAULT_QUEUE_DEPTH, ChunkWriter, PrefetchingReader, add_pipeline_arguments
+from raw_sources import find_raw_source, open_raw_source
+from shrid_utils import encode_shrid2
+
+# Define paths
+RAW_DATA_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\raw")
+PROCESSED_DATA_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\processed")
+CLEANED_FILES_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\processed\cleaned_files")
+
+CHUNK_SIZE = 50000
+
+# SHRUG modules keyed on shrid2: download name, file prefix ({prefix}_shrid.csv) and columns to keep
+SHRUG_MODULES = {
+    'pc01_pca': {'dataset': 'pc01-pca', 'prefix': 'pc01_pca_clean', 'columns': ['pc01_pca_tot_p']},
+    'pc11_pca': {'dataset': 'pc11-pca', 'prefix': 'pc11_pca_clean', 'columns': ['pc11_pca_tot_p']},
+    'pc11_vd': {'dataset': 'pc11-vd', 'prefix': 'pc11_vd_clean', 'columns': ['pc11_vd_area']},
+    'pc11_td': {'dataset': 'pc11-td', 'prefix': 'pc11_td_clean', 'columns': ['pc11_td_area']},
+}
+
+# Area columns to sq km: the village directory gives hectares, the town directory sq km
+AREA_SQ_KM_FACTORS = {'pc11_vd_area': 0.01, 'pc11_td_area': 1.0}
+
+# Denominators per census year: the nearest population census, and village + town area
+YEAR_DENOMINATORS = {
+    'ec98': {'population': ['pc01_pca_tot_p'], 'area': ['pc11_vd_area', 'pc11_td_area']},
+    'ec05': {'population': ['pc01_pca_tot_p'], 'area': ['pc11_vd_area', 'pc11_td_area']},
+    'ec13': {'population': ['pc11_pca_tot_p'], 'area': ['pc11_vd_area', 'pc11_td_area']},
+}
+
+def get_module_store_dir(module_name, processed_dir=PROCESSED_DATA_DIR):
+    """Directory holding the converted key and column files of one module"""
+    return Path(processed_dir) / "shrug_modules" / module_name
+
+def convert_module(module_name, raw_data_dir=RAW_DATA_DIR, processed_dir=PROCESSED_DATA_DIR, rebuild=False):
+    """Convert a SHRUG module to sorted int64 keys + one .npy file per column (skipped if up to date)"""
+
+    spec = SHRUG_MODULES[module_name]
+    source = find_raw_source(raw_data_dir, spec['prefix'], spec['dataset'])
+    store_dir = get_module_store_dir(module_name, processed_dir)
+    keys_file = store_dir / "keys.npy"
+
+    if not rebuild and keys_file.exists() and keys_file.stat().st_mtime >= source.stat().st_mtime:
+        return store_dir
+
+    print(f"Converting {module_name} from {source}...")
+    key_blocks = []
+    value_blocks = {column: [] for column in spec['columns']}
+    with open_raw_source(source, member_name=f"{spec['prefix']}_shrid.csv") as raw_file:
+        chunks = pd.read_csv(raw_file, usecols=['shrid2'] + spec['columns'], dtype={'shrid2': str},
+                             chunksize=CHUNK_SIZE)
+        for chunk in PrefetchingReader(chunks):
+            key_blocks.append(encode_shrid2(chunk['shrid2']))
+            for column in spec['columns']:
+                value_blocks[column].append(chunk[column].to_numpy(dtype=float))
+
+    keys = np.concatenate(key_blocks)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    columns = {column: np.concatenate(blocks)[order] for column, blocks in value_blocks.items()}
+
+    # Units listed more than once (e.g. several villages in one shrid) are summed
+    unique_keys, starts = np.unique(keys, return_index=True)
+    if len(unique_keys) < len(keys):
+        print(f"  {len(keys) - len(unique_keys):,} duplicate shrid2 rows summed")
+        columns = {column: np.add.reduceat(np.nan_to_num(values), starts) for column, values in columns.items()}
+        keys = unique_keys
+
+    store_dir.mkdir(parents=True, exist_ok=True)
+    for column, values in columns.items():
+        np.save(store_dir / f"{column}.npy", values)
+    np.save(keys_file, keys)  # written last, so an interrupted conversion is redone
+    print(f"Saved {len(keys):,} {module_name} units to {store_dir}")
+    return store_dir
+
+class ModuleColumns:
+    """Memory-mapped sorted keys and columns of one converted module"""
+
+    def __init__(self, store_dir, columns):
+        self.keys = np.load(Path(store_dir) / "keys.npy", mmap_mode='r')
+        self.columns = {column: np.load(Path(store_dir) / f"{column}.npy", mmap_mode='r') for column in columns}
+
+    def lookup(self, keys):
+        """Column values for the given keys (NaN where a key is not in the module)"""
+
+        if len(self.keys) == 0:
+            return np.zeros(len(keys), dtype=bool), {column: np.full(len(keys), np.nan) for column in self.columns}
+
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[positions] == keys
+        return found, {column: np.where(found, values[positions], np.nan) for column, values in self.columns.items()}
+
+def sum_available(frame, columns):
+    """Row sums over the columns that were joined (NaN where none of them has a value)"""
+
+    columns = [column for column in columns if column in frame.columns]
+    if not columns:
+        return None
+    return frame[columns].sum(axis=1, min_count=1)
+
+def add_intensity_columns(chunk, joined, prefix, denominators):
+    """Per-1000-population and per-sq-km versions of the employment and firm columns"""
+
+    population = sum_available(joined, denominators['population'])
+    area_sq_km = joined.assign(**{column: joined[column] * factor for column, factor in AREA_SQ_KM_FACTORS.items()
+                                  if column in joined.columns})
+    area = sum_available(area_sq_km, denominators['area'])
+    count_columns = [column for column in chunk.columns if column.startswith((f'{prefix}_emp_', f'{prefix}_count_'))]
+
+    output = {'shrid2': chunk['shrid2'].to_numpy()}
+    output.update({column: values.to_numpy() for column, values in joined.items()})
+
+    if population is not None:
+        output[f'{prefix}_population'] = population.to_numpy()
+        safe_population = population.where(population > 0).to_numpy() / 1000
+        for column in count_columns:
+            output[f'{column}_per_1000_pop'] = chunk[column].to_numpy() / safe_population
+
+    if area is not None:
+        output[f'{prefix}_area_sq_km'] = area.to_numpy()
+        safe_area = area.where(area > 0).to_numpy()
+        for column in count_columns:
+            output[f'{column}_per_sq_km'] = chunk[column].to_numpy() / safe_area
+
+    return pd.DataFrame(output)
+
+def merge_modules(prefix, modules, output_dir=CLEANED_FILES_DIR, queue_depth=DEFAULT_QUEUE_DEPTH,
+                  processed_dir=PROCESSED_DATA_DIR):
+    """Stream one simplified output and join every module in a single pass
+
+    Writes ecXX_shrid_per_capita.csv (shrid2, module columns in their own units, population,
+    area in sq km and the per-capita / per-sq-km columns) and returns its path.
+    """
+
+    simplified_file = Path(output_dir) / f"{prefix}_shrid_simplified.csv"
+    output_file = Path(output_dir) / f"{prefix}_shrid_per_capita.csv"
+    denominators = YEAR_DENOMINATORS[prefix]
+
+    # Only join modules that provide a denominator for this year
+    wanted = set(denominators['population'] + denominators['area'])
+    module_columns = {}
+    for module_name in modules:
+        columns = [column for column in SHRUG_MODULES[module_name]['columns'] if column in wanted]
+        if columns:
+            module_columns[module_name] = ModuleColumns(get_module_store_dir(module_name, processed_dir), columns)
+
+    print(f"Joining {', '.join(module_columns) or 'no modules'} onto {simplified_file.name}...")
+    n_units = 0
+    n_matched = {module_name: 0 for module_name in module_columns}
+
+    with ChunkWriter(output_file, queue_depth) as writer:
+        chunks = pd.read_csv(simplified_file, dtype={'shrid2': str}, chunksize=CHUNK_SIZE)
+        for chunk in PrefetchingReader(chunks, queue_depth):
+            keys = encode_shrid2(chunk['shrid2'])
+            joined = {}
+            for module_name, module in module_columns.items():
+                found, values = module.lookup(keys)
+                n_matched[module_name] += int(found.sum())
+                joined.update(values)
+
+            writer.write(add_intensity_columns(chunk, pd.DataFrame(joined), prefix, denominators))
+            n_units += len(chunk)
+
+    for module_name, matched in n_matched.items():
+        print(f"  {module_name}: matched {matched:,} of {n_units:,} units ({100 * matched / max(n_units, 1):.1f}%)")
+    print(f"Saved per-capita and per-sq-km features to {output_file}")
+    return output_file
+
+def merge_all_years(years=None, modules=None, raw_data_dir=RAW_DATA_DIR, processed_dir=PROCESSED_DATA_DIR,
+                    output_dir=CLEANED_FILES_DIR, queue_depth=DEFAULT_QUEUE_DEPTH, rebuild=False):
+    """Convert the available modules once and join them onto every simplified output"""
+
+    available_modules = []
+    for module_name in modules or SHRUG_MODULES:
+        try:
+            convert_module(module_name, raw_data_dir, processed_dir, rebuild)
+            available_modules.append(module_name)
+        except FileNotFoundError:
+            print(f"⚠️ SHRUG module {module_name} not found in {raw_data_dir} - skipping")
+
+    if not available_modules:
+        print("⚠️ No SHRUG modules available - per-capita features not created")
+        return []
+
+    output_files = []
+    for prefix in years or YEAR_DENOMINATORS:
+        if (Path(output_dir) / f"{prefix}_shrid_simplified.csv").exists():
+            output_files.append(merge_modules(prefix, available_modules, output_dir, queue_depth, processed_dir))
+    return output_files
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Join SHRUG population/area modules onto the simplified census outputs")
+    parser.add_argument('--years', nargs='+', choices=list(YEAR_DENOMINATORS), default=None,
+                        help='Census years to process (default: all with simplified outputs)')
+    parser.add_argument('--modules', nargs='+', choices=list(SHRUG_MODULES), default=None,
+                        help='SHRUG modules to join (default: all found in data/raw)')
+    parser.add_argument('--rebuild', action='store_true', help='Convert the modules again even if they are up to date')
+    add_pipeline_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    """Build the per-capita outputs"""
+    args = parse_args()
+    merge_all_years(args.years, args.modules, queue_depth=args.queue_depth, rebuild=args.rebuild)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Nearest-neighbour search for units that look economically alike
+Indexes the similarity features of the persisted, already scaled feature matrix of each census
+year (ecXX_feature_matrix.npy, see normalisation.py and feature_matrix.py) with a k-d tree and answers batched k-NN queries by shrid2 or by feature vector
+
+Usage:
+    python similarity_search.py ec13 11-09-151-00829-000123 --k 20
+"""
+
+import argparse
+import pickle
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from scipy.spatial import cKDTree
+
+from feature_matrix import get_feature_columns, get_feature_name
+from normalisation import apply_scaler, load_feature_matrix, select_matrix_columns
+
+# Define paths
+CLEANED_FILES_DIR = Path(r"d:\BDA_project\BDA_project\prithvi_rand\IndiaMarketProject\data\processed\cleaned_files")
+
+def get_similarity_index_file(output_dir, prefix):
+    """File holding the persisted similarity index of one census year"""
+    return Path(output_dir) / f"{prefix}_similarity_index.pkl"
+
+class SimilarityIndex:
+    """k-d tree over scaled unit feature vectors
+
+    Example:
+        index = SimilarityIndex.load(get_similarity_index_file(CLEANED_FILES_DIR, 'ec13'))
+        lookalikes = index.query_units(['11-09-151-00829-000123'], k=20)
+    """
+
+    def __init__(self, prefix, shrid2, feature_names, scaler_params, tree):
+        self.prefix = prefix
+        self.shrid2 = shrid2
+        self.feature_names = feature_names
+        self.scaler_params = scaler_params
+        self.tree = tree
+        self._unit_index = None
+
+    def __getstate__(self):
+        # The shrid2 lookup index is rebuilt on demand rather than pickled
+        state = self.__dict__.copy()
+        state['_unit_index'] = None
+        return state
+
+    @property
+    def unit_index(self):
+        """pandas Index of shrid2 values (built on first use)"""
+        if self._unit_index is None:
+            self._unit_index = pd.Index(self.shrid2.astype(str))
+        return self._unit_index
+
+    @classmethod
+    def build(cls, output_dir, prefix):
+        """Build the tree over the feature columns of the persisted feature matrix of one census year
+
+        The scaler parameters of those columns (from ecXX_scaler.json) are kept for query_vectors.
+        """
+
+        print(f"Building similarity index for {prefix.upper()}...")
+
+        matrix, shrid2, params = load_feature_matrix(output_dir, prefix)
+        columns = get_feature_columns(prefix, [column['name'] for column in params['columns']])
+        values, scaler_params = select_matrix_columns(matrix, params, columns)
+
+        # shrid2 is kept as fixed-width bytes to keep the persisted index small
+        return cls(prefix, np.asarray(shrid2), [get_feature_name(column, prefix) for column in columns],
+                   scaler_params, cKDTree(values))
+
+    def save(self, path):
+        """Persist the index (tree included) next to the cleaned files"""
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as index_file:
+            pickle.dump(self, index_file, protocol=pickle.HIGHEST_PROTOCOL)
+        print(f"Saved similarity index ({len(self.shrid2):,} units, {len(self.feature_names)} features) to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved with SimilarityIndex.save"""
+        with open(path, 'rb') as index_file:
+            return pickle.load(index_file)
+
+    def query_matrix(self, matrix, k=10, eps=0.0, exclude=None):
+        """k nearest units for each row of an already scaled matrix
+
+        exclude: optional array of row positions (one per query) to drop from the results,
+        used so that a unit is not returned as its own neighbour
+        """
+
+        n_neighbours = k + 1 if exclude is not None else k
+        distances, positions = self.tree.query(matrix, k=n_neighbours, eps=eps, workers=-1)
+        distances = distances.reshape(len(matrix), n_neighbours)
+        positions = positions.reshape(len(matrix), n_neighbours)
+
+        if exclude is not None:
+            # Drop the query unit itself (or the last neighbour if it was not found)
+            is_self = positions == np.asarray(exclude)[:, None]
+            is_self[~is_self.any(axis=1), -1] = True
+            keep = ~is_self
+            distances = distances[keep].reshape(len(matrix), k)
+            positions = positions[keep].reshape(len(matrix), k)
+
+        return distances, positions
+
+    def to_frame(self, query_labels, distances, positions):
+        """Long-format results: one row per (query, neighbour)"""
+
+        k = positions.shape[1]
+        return pd.DataFrame({
+            'query': np.repeat(query_labels, k),
+            'rank': np.tile(np.arange(1, k + 1), len(query_labels)),
+            'shrid2': self.shrid2[positions.ravel()].astype(str),
+            'distance': distances.ravel(),
+        })
+
+    def query_units(self, shrid2, k=10, eps=0.0):
+        """k most similar units for each of a batch of shrid2 values (excluding the unit itself)"""
+
+        shrid2 = np.atleast_1d(np.asarray(shrid2, dtype=str))
+        positions = self.unit_index.get_indexer(shrid2)
+        if (positions < 0).any():
+            raise KeyError(f"Units not in the {self.prefix} similarity index: {list(shrid2[positions < 0][:5])}")
+
+        matrix = self.tree.data[positions]
+        distances, neighbours = self.query_matrix(matrix, k, eps, exclude=positions)
+        return self.to_frame(shrid2, distances, neighbours)
+
+    def query_vectors(self, feature_vectors, k=10, eps=0.0):
+        """k most similar units for unscaled feature vectors (e.g. from feature_matrix.build_feature_frame)"""
+
+        feature_vectors = pd.DataFrame(feature_vectors)
+        missing = [name for name in self.feature_names if name not in feature_vectors.columns]
+        if missing:
+            raise KeyError(f"Feature vectors are missing columns: {missing}")
+
+        matrix = apply_scaler(feature_vectors[self.feature_names].to_numpy(dtype=float), self.scaler_params)
+        distances, neighbours = self.query_matrix(matrix, k, eps)
+        return self.to_frame(feature_vectors.index.to_numpy(), distances, neighbours)
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Find units that look economically like the given shrid2 units")
+    parser.add_argument('prefix', choices=['ec98', 'ec05', 'ec13'], help='Census year')
+    parser.add_argument('shrid2', nargs='+', help='One or more shrid2 identifiers')
+    parser.add_argument('--k', type=int, default=10, help='Number of neighbours per unit (default: 10)')
+    parser.add_argument('--eps', type=float, default=0.0,
+                        help='Approximation factor: neighbours are within (1 + eps) of the true distance (default: exact)')
+    return parser.parse_args()
+
+def main():
+    """Print the nearest neighbours of the given units"""
+    args = parse_args()
+
+    index = SimilarityIndex.load(get_similarity_index_file(CLEANED_FILES_DIR, args.prefix))
+    print(index.query_units(args.shrid2, k=args.k, eps=args.eps).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
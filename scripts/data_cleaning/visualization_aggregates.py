@@ -0,0 +1,178 @@
+"""
+Precompute compact, plot-ready aggregates from the simplified Economic Census data
+Dashboards load these small files instead of the full unit-level *_simplified.csv
+"""
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+
+from shrid_utils import CENSUS_YEARS, extract_state_id
+
+HISTOGRAM_BINS = 20
+QUANTILES = [0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
+SCATTER_SAMPLE_SIZE = 5000
+SAMPLE_RANDOM_STATE = 42
+NATIONAL_LABEL = 'ALL'
+
+def get_feature_columns(df_simplified):
+    """Return the numeric columns that should be aggregated for plotting"""
+    return [col for col in df_simplified.columns
+            if col != 'shrid2' and pd.api.types.is_numeric_dtype(df_simplified[col])]
+
+def get_histogram_edges(values, column):
+    """Choose fixed bin edges for a feature so that all states share the same bins"""
+
+    max_value = float(np.nanmax(values)) if len(values) else 0.0
+
+    # Ratios and HHI live in [0, 1]
+    if column.endswith('_ratio') or column.endswith('_hhi'):
+        return np.linspace(0, 1, HISTOGRAM_BINS + 1)
+
+    # Scores are small integers - one bin per value
+    if column.endswith('_score') or column.endswith('_diversity'):
+        return np.arange(0, max(max_value, 1) + 2) - 0.5
+
+    # Employment and firm counts are heavy-tailed - use log-spaced bins
+    return np.expm1(np.linspace(0, np.log1p(max(max_value, 1)), HISTOGRAM_BINS + 1))
+
+def build_histograms(df_simplified, states, features):
+    """Fixed-bin histograms per feature per state (plus a national row)"""
+
+    state_codes, state_labels = pd.factorize(states, sort=True)
+    n_states = len(state_labels)
+    rows = []
+
+    for feature in features:
+        values = df_simplified[feature].to_numpy(dtype=float)
+        edges = get_histogram_edges(values, feature)
+        n_bins = len(edges) - 1
+
+        bin_idx = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, n_bins - 1)
+        valid = ~np.isnan(values)
+
+        # One bincount over (state, bin) pairs gives every state's histogram at once
+        counts = np.bincount(
+            state_codes[valid] * n_bins + bin_idx[valid],
+            minlength=n_states * n_bins
+        ).reshape(n_states, n_bins)
+
+        all_counts = np.vstack([counts, counts.sum(axis=0)])
+        all_labels = list(state_labels) + [NATIONAL_LABEL]
+
+        for state, state_counts in zip(all_labels, all_counts):
+            rows.append(pd.DataFrame({
+                'state': state,
+                'feature': feature,
+                'bin': np.arange(n_bins),
+                'bin_left': edges[:-1],
+                'bin_right': edges[1:],
+                'count': state_counts,
+            }))
+
+    return pd.concat(rows, ignore_index=True)
+
+def build_quantiles(df_simplified, states, features):
+    """Quantiles per feature per state (plus a national row) in long format"""
+
+    by_state = df_simplified[features].groupby(states.to_numpy()).quantile(QUANTILES)
+    national = df_simplified[features].quantile(QUANTILES)
+    national.index = pd.MultiIndex.from_product([[NATIONAL_LABEL], national.index])
+
+    quantiles = pd.concat([by_state, national])
+    quantiles.index.names = ['state', 'quantile']
+
+    return quantiles.reset_index().melt(
+        id_vars=['state', 'quantile'], var_name='feature', value_name='value'
+    )
+
+def build_state_totals(df_simplified, states, prefix):
+    """Employment and firm totals per state (plus a national row)"""
+
+    total_columns = [col for col in df_simplified.columns
+                     if col.startswith(f'{prefix}_emp_') or col.startswith(f'{prefix}_count_')
+                     or col == f'{prefix}_non_farm_employment']
+
+    totals = df_simplified[total_columns].groupby(states.to_numpy()).sum()
+    totals.insert(0, 'units', states.value_counts().reindex(totals.index).to_numpy())
+
+    national = totals.sum().to_frame(NATIONAL_LABEL).T
+    totals = pd.concat([totals, national])
+    totals.index.name = 'state'
+
+    return totals.reset_index()
+
+def build_scatter_sample(df_simplified, states, features):
+    """Downsampled unit-level rows for scatter plots"""
+
+    n_sample = min(SCATTER_SAMPLE_SIZE, len(df_simplified))
+    sample = df_simplified[['shrid2'] + features].sample(n=n_sample, random_state=SAMPLE_RANDOM_STATE)
+    sample.insert(1, 'state', states.loc[sample.index].to_numpy())
+
+    return sample.reset_index(drop=True)
+
+def build_visualization_aggregates(df_simplified, prefix, output_dir):
+    """Build and save all plot-ready aggregates for one census year"""
+
+    print(f"Building visualization aggregates for {prefix.upper()}...")
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    states = extract_state_id(df_simplified['shrid2'])
+    features = get_feature_columns(df_simplified)
+
+    aggregates = {
+        'histograms': build_histograms(df_simplified, states, features),
+        'quantiles': build_quantiles(df_simplified, states, features),
+        'state_totals': build_state_totals(df_simplified, states, prefix),
+        'scatter_sample': build_scatter_sample(df_simplified, states, features),
+    }
+
+    for name, aggregate_df in aggregates.items():
+        aggregate_file = output_dir / f"{prefix}_{name}.csv"
+        aggregate_df.to_csv(aggregate_file, index=False)
+        print(f"Saved {name.replace('_', ' ')} ({len(aggregate_df):,} rows) to {aggregate_file}")
+
+    return aggregates
+
+def combine_year_totals(output_dir):
+    """Combine the national totals of every available census year into one long table"""
+
+    output_dir = Path(output_dir)
+    year_totals = []
+
+    for prefix, year in CENSUS_YEARS.items():
+        totals_file = output_dir / f"{prefix}_state_totals.csv"
+        if not totals_file.exists():
+            continue
+
+        totals = pd.read_csv(totals_file, dtype={'state': str})
+        national = totals[totals['state'] == NATIONAL_LABEL].drop(columns='state')
+        national.columns = [col.replace(f'{prefix}_', '', 1) for col in national.columns]
+
+        long_totals = national.melt(var_name='metric', value_name='total')
+        long_totals.insert(0, 'year', year)
+        year_totals.append(long_totals)
+
+    if not year_totals:
+        return None
+
+    year_totals_df = pd.concat(year_totals, ignore_index=True)
+    year_totals_file = output_dir / "year_totals.csv"
+    year_totals_df.to_csv(year_totals_file, index=False)
+    print(f"Saved per-year totals to {year_totals_file}")
+
+    return year_totals_df
+
+def load_visualization_aggregates(prefix, output_dir):
+    """Load the precomputed aggregates for one census year as a dict of DataFrames"""
+
+    output_dir = Path(output_dir)
+    names = ['histograms', 'quantiles', 'state_totals', 'scatter_sample']
+
+    return {
+        name: pd.read_csv(output_dir / f"{prefix}_{name}.csv", dtype={'state': str})
+        for name in names
+        if (output_dir / f"{prefix}_{name}.csv").exists()
+    }